@@ -0,0 +1,115 @@
+"""
+Measure the latency of sequential RPCs to an in-process plugin server over TCP
+and over a Unix socket, both with mutual TLS.
+
+    python -m benchmarks.rpc_latency [--calls N] [--loop {asyncio,uvloop}] [--eager]
+"""
+
+import argparse
+import asyncio
+import ssl
+import statistics
+import tempfile
+import time
+import typing
+
+import grpclib.client
+import grpclib.config
+import grpclib.server
+
+from terraform import plugin, schemas, utils
+from terraform.protos import tfplugin5_1_grpc, tfplugin5_1_pb2
+
+
+def create_client_ssl_context(
+    server_certificate: utils.CertificatePrivateKey,
+    client_certificate: utils.CertificatePrivateKey,
+) -> ssl.SSLContext:
+    key = utils.encode_private_key(client_certificate.private_key)
+    certificate = utils.encode_certificate_pem(client_certificate.certificate)
+    with utils.memory_file(key) as keyfile, utils.memory_file(certificate) as certfile:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        # The server certificate is pinned, as go-plugin does
+        ctx.check_hostname = False
+        ctx.load_cert_chain(certfile=certfile, keyfile=keyfile)
+        ctx.load_verify_locations(
+            cadata=utils.encode_certificate_pem(server_certificate.certificate).decode(
+                "ascii"
+            )
+        )
+    ctx.set_alpn_protocols(["h2"])
+    return ctx
+
+
+async def measure(channel: grpclib.client.Channel, calls: int) -> typing.List[float]:
+    stub = tfplugin5_1_grpc.ProviderStub(channel)
+    request = tfplugin5_1_pb2.GetProviderSchema.Request()
+    # Warm up the connection
+    await stub.GetSchema(request)
+
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await stub.GetSchema(request)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def report(network: str, latencies: typing.List[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+    print(
+        f"{network:5} median {statistics.median(latencies) * 1e6:7.1f} us"
+        f"  p99 {p99 * 1e6:7.1f} us"
+        f"  {len(latencies) / sum(latencies):8.0f} calls/s"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.eager:
+        plugin.use_eager_tasks(asyncio.get_running_loop())
+
+    server_certificate = utils.generate_certificate()
+    client_certificate = utils.generate_certificate()
+    server_ctx = plugin.create_ssl_context(
+        server_certificate,
+        utils.encode_certificate_pem(client_certificate.certificate).decode("ascii"),
+    )
+    client_ctx = create_client_ssl_context(server_certificate, client_certificate)
+    config = grpclib.config.Configuration(ssl_target_name_override="localhost")
+
+    service = plugin.ProviderService(provider=schemas.Provider())
+
+    server = grpclib.server.Server([service])
+    address = await plugin.start_tcp_server(
+        server, min_port=10000, max_port=25000, ssl_context=server_ctx
+    )
+    host, port = address.rsplit(":", 1)
+    channel = grpclib.client.Channel(host, int(port), ssl=client_ctx, config=config)
+    report("tcp", await measure(channel, args.calls))
+    channel.close()
+    server.close()
+    await server.wait_closed()
+
+    with tempfile.TemporaryDirectory(prefix="plugin") as directory:
+        server = grpclib.server.Server([service])
+        path = await plugin.start_unix_server(
+            server, directory=directory, ssl_context=server_ctx
+        )
+        channel = grpclib.client.Channel(path=path, ssl=client_ctx, config=config)
+        report("unix", await measure(channel, args.calls))
+        channel.close()
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--loop", choices=["asyncio", "uvloop"], default="asyncio")
+    parser.add_argument("--eager", action="store_true")
+    args = parser.parse_args()
+
+    if args.loop == "uvloop":
+        plugin.use_uvloop()
+    asyncio.run(main(args))
@@ -0,0 +1,70 @@
+"""
+Measure the time from launching a plugin process to its handshake line, for each
+certificate curve.
+
+    python -m benchmarks.startup [--runs N] [--curve CURVE ...]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from terraform import settings, utils
+
+PLUGIN = """
+from terraform import plugin, schemas
+plugin.run(provider=schemas.Provider())
+"""
+
+
+def launch(curve: str, client_cert: str) -> float:
+    env = dict(
+        os.environ,
+        PLUGIN_CLIENT_CERT=client_cert,
+        PLUGIN_MIN_PORT="10000",
+        PLUGIN_MAX_PORT="25000",
+    )
+    env[settings.MAGIC_COOKIE_KEY] = settings.MAGIC_COOKIE_VALUE
+    env[settings.CERTIFICATE_CURVE_ENV] = curve
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", PLUGIN], env=env, stdout=subprocess.PIPE
+    )
+    try:
+        line = process.stdout.readline()
+        elapsed = time.perf_counter() - started
+        if not line:
+            raise RuntimeError(f"Plugin exited with {process.wait()}")
+    finally:
+        process.kill()
+        process.wait()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--curve", action="append", choices=sorted(utils.CERTIFICATE_CURVES)
+    )
+    args = parser.parse_args()
+
+    client_cert = utils.encode_certificate_pem(
+        utils.generate_certificate().certificate
+    ).decode("ascii")
+
+    for curve in args.curve or list(utils.CERTIFICATE_CURVES):
+        samples = [launch(curve, client_cert) for _ in range(args.runs)]
+        print(
+            f"{curve:8} median {statistics.median(samples) * 1000:7.1f} ms"
+            f"  min {min(samples) * 1000:7.1f} ms"
+            f"  max {max(samples) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import typing
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+BatchFunc = typing.Callable[
+    [typing.List[T]], typing.Awaitable[typing.Sequence[typing.Union[R, Exception]]]
+]
+
+
+class Batcher(typing.Generic[T, R]):
+    """
+    Collect items submitted concurrently and process them with a single call.
+
+    A batch is flushed once ``window`` seconds have passed since its first item was
+    submitted, or as soon as it holds ``max_size`` items. ``func`` receives the
+    items of a batch and must return one result per item, in the same order. An
+    exception in place of a result is raised to the submitter of that item only.
+    """
+
+    def __init__(self, func: BatchFunc, *, window: float, max_size: int):
+        self.func = func
+        self.window = window
+        self.max_size = max_size
+        self.pending: typing.List[typing.Tuple[T, asyncio.Future]] = []
+        self.timer: typing.Optional[asyncio.TimerHandle] = None
+        self.tasks: typing.Set[asyncio.Future] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        pending, self.pending = self.pending, []
+        # Waiters that went away while the batch was collecting are not sent
+        pending = [(item, future) for item, future in pending if not future.done()]
+        if not pending:
+            return
+
+        task = asyncio.ensure_future(self.run(pending))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self, pending: typing.List[typing.Tuple[T, asyncio.Future]]):
+        items = [item for item, _ in pending]
+
+        try:
+            results = await self.func(items)
+        except asyncio.CancelledError:
+            for _, future in pending:
+                future.cancel()
+            raise
+        except Exception as exc:
+            results = [exc] * len(items)
+        else:
+            if len(results) != len(items):
+                error = RuntimeError(
+                    f"Batch returned {len(results)} results for {len(items)} items"
+                )
+                results = [error] * len(items)
+
+        for (_, future), result in zip(pending, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,514 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import dataclasses
+import functools
+import logging
+import os
+import struct
+import tempfile
+import time
+import typing
+
+from terraform import settings, utils
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+K = typing.TypeVar("K", bound=typing.Hashable)
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class CacheEntry(typing.NamedTuple):
+    value: bytes
+    expires_at: float
+
+
+class LRUCache(typing.Generic[K]):
+    """
+    In-memory cache of encoded values with a TTL per entry.
+
+    The least recently used entries are evicted once the cache holds more than
+    ``max_entries`` entries or more than ``max_bytes`` bytes of values.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.entries: "collections.OrderedDict[K, CacheEntry]" = (
+            collections.OrderedDict()
+        )
+        self.size = 0
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: K) -> typing.Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        if entry.expires_at <= self.clock():
+            self.remove(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry.value
+
+    def set(self, key: K, value: bytes, *, ttl: float) -> None:
+        self.remove(key)
+
+        if len(value) > self.max_bytes:
+            return
+
+        self.entries[key] = CacheEntry(value=value, expires_at=self.clock() + ttl)
+        self.size += len(value)
+
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.stats.evictions += 1
+
+    def remove(self, key: K) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.value)
+
+    def invalidate(
+        self, predicate: typing.Callable[[K], bool] = lambda key: True
+    ) -> int:
+        """Remove the entries whose key matches ``predicate``, all by default."""
+        keys = [key for key in self.entries if predicate(key)]
+        for key in keys:
+            self.remove(key)
+        return len(keys)
+
+
+class PrefetchCache:
+    """
+    Results of speculative calls started ahead of the operation that needs them,
+    kept for a short TTL.
+
+    An entry is consumed by the first lookup. The oldest calls are cancelled once
+    the cache holds more than ``max_entries`` entries.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 256,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.clock = clock
+        # Futures of the calls and their expiry, oldest first
+        self.entries: typing.Dict[
+            typing.Hashable, typing.Tuple[asyncio.Future, float]
+        ] = {}
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def start(
+        self,
+        key: typing.Hashable,
+        func: typing.Callable[[], typing.Awaitable[typing.Any]],
+        *,
+        ttl: float,
+    ) -> asyncio.Future:
+        """Start calling ``func`` in the background and keep its result for ``key``."""
+
+        async def call() -> typing.Any:
+            try:
+                return await func()
+            except Exception:
+                logger.debug("Prefetch of %s failed", key, exc_info=True)
+                return None
+
+        self.discard(key)
+        future = asyncio.ensure_future(call())
+        self.entries[key] = (future, self.clock() + ttl)
+
+        while len(self.entries) > self.max_entries:
+            self.discard(next(iter(self.entries)))
+            self.stats.evictions += 1
+        return future
+
+    async def pop(
+        self, key: typing.Hashable, *, timeout: typing.Optional[float] = None
+    ) -> typing.Any:
+        """
+        Return the result of the call started for ``key``, waiting up to ``timeout``
+        seconds for it while it is still running. Return ``None`` when there is no
+        call, it expired, it failed or it did not complete in time.
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        future, expires_at = entry
+        if expires_at <= self.clock():
+            future.cancel()
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        try:
+            done, _ = await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        if not done or future.cancelled():
+            future.cancel()
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return future.result()
+
+    def discard(self, key: typing.Hashable) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            entry[0].cancel()
+
+    def clear(self) -> None:
+        for key in list(self.entries):
+            self.discard(key)
+
+
+class PersistentCache:
+    """
+    On-disk cache of encoded values backed by an sqlite database, so that results
+    survive across plugin processes.
+
+    Expired entries are removed, and the least recently used ones after them, when
+    the values stored grow past ``max_bytes``. All database access happens on a
+    dedicated worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_bytes: int = 256 * 1024 * 1024,
+        clock: typing.Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = CacheStats()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="terraform-cache"
+        )
+        import sqlite3
+
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        # Estimated size of the values stored, corrected on each compaction
+        self.size = 0
+        self.compact_sync()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> typing.Optional["PersistentCache"]:
+        path = os.getenv(settings.CACHE_PATH_ENV)
+        if not path:
+            return None
+        return cls(path, **kwargs)
+
+    async def run(self, func: typing.Callable, *args) -> typing.Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def get(self, key: str) -> typing.Optional[bytes]:
+        return await self.run(self.get_sync, key)
+
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        await self.run(self.set_sync, key, value, ttl)
+
+    async def invalidate(self, key: str) -> None:
+        await self.run(self.invalidate_sync, key)
+
+    async def invalidate_prefix(self, prefix: str) -> int:
+        return await self.run(self.invalidate_prefix_sync, prefix)
+
+    async def close(self) -> None:
+        await self.run(self.connection.close)
+        self.executor.shutdown()
+
+    def get_sync(self, key: str) -> typing.Optional[bytes]:
+        now = self.clock()
+        row = self.connection.execute(
+            "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+
+        self.connection.execute(
+            "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self.stats.hits += 1
+        return row[0]
+
+    def set_sync(self, key: str, value: bytes, ttl: float) -> None:
+        now = self.clock()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now + ttl, now),
+        )
+        self.size += len(value)
+        if self.size > self.max_bytes:
+            self.compact_sync()
+
+    def invalidate_sync(self, key: str) -> None:
+        self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def invalidate_prefix_sync(self, prefix: str) -> int:
+        """Remove the entries whose key starts with ``prefix``."""
+        cursor = self.connection.execute(
+            "DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return max(cursor.rowcount, 0)
+
+    def size_sync(self) -> int:
+        (size,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return size
+
+    def compact_sync(self) -> None:
+        cursor = self.connection.execute(
+            "DELETE FROM entries WHERE expires_at <= ?", (self.clock(),)
+        )
+        self.stats.expirations += max(cursor.rowcount, 0)
+
+        size = self.size_sync()
+        self.size = size
+        if size <= self.max_bytes:
+            return
+
+        rows = self.connection.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at"
+        ).fetchall()
+        for key, entry_size in rows:
+            if size <= self.max_bytes:
+                break
+            self.invalidate_sync(key)
+            self.stats.evictions += 1
+            size -= entry_size
+        self.size = size
+
+
+class SharedCache:
+    """
+    Cache of encoded values in a directory that plugin processes on the same host
+    share.
+
+    Each value is stored in its own file, prefixed with its expiry time and its key,
+    and replaced atomically. Filling a missing value holds an advisory lock on the key,
+    so that only one process calls the backend for it while the others wait for
+    the result.
+    """
+
+    # Expiry time and size of the key
+    header = struct.Struct(">dI")
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        lock_poll_interval: float = 0.01,
+        clock: typing.Callable[[], float] = time.time,
+    ):
+        if fcntl is None:
+            raise RuntimeError("SharedCache requires advisory file locking support")
+
+        self.directory = directory
+        self.lock_poll_interval = lock_poll_interval
+        self.clock = clock
+        self.stats = CacheStats()
+        os.makedirs(os.path.join(directory, "locks"), mode=0o700, exist_ok=True)
+        self.prune()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> typing.Optional["SharedCache"]:
+        directory = os.getenv(settings.SHARED_CACHE_DIR_ENV)
+        if not directory or fcntl is None:
+            return None
+        return cls(directory, **kwargs)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, utils.digest(key.encode()))
+
+    def lock_path(self, key: str) -> str:
+        return os.path.join(self.directory, "locks", utils.digest(key.encode()))
+
+    async def get(self, key: str) -> typing.Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        value = await loop.run_in_executor(None, self.read, key)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.write, key, value, self.clock() + ttl)
+
+    async def invalidate_prefix(self, prefix: str) -> int:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.remove_prefix, prefix)
+
+    async def get_or_fill(
+        self,
+        key: str,
+        fill: typing.Callable[[], typing.Awaitable[typing.Optional[bytes]]],
+        *,
+        ttl: float,
+    ) -> typing.Optional[bytes]:
+        """
+        Return the value of ``key``, calling ``fill`` to produce it when missing.
+
+        ``fill`` is only called by the process holding the lock for the key, and a
+        value of ``None`` is returned without being stored.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        fd = os.open(self.lock_path(key), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            await self.lock(fd)
+            try:
+                # Another process may have filled the value while we waited
+                value = await self.get(key)
+                if value is None:
+                    value = await fill()
+                    if value is not None:
+                        await self.set(key, value, ttl=ttl)
+                return value
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    async def lock(self, fd: int) -> None:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                await asyncio.sleep(self.lock_poll_interval)
+            else:
+                return
+
+    def read(self, key: str) -> typing.Optional[bytes]:
+        try:
+            with open(self.path(key), "rb") as file:
+                header = self.read_header(file)
+                if header is None:
+                    return None
+                entry_key, expires_at = header
+                if entry_key != key or expires_at <= self.clock():
+                    return None
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def read_header(
+        self, file: typing.BinaryIO
+    ) -> typing.Optional[typing.Tuple[str, float]]:
+        """Read the key and expiry time at the start of a value file."""
+        header = file.read(self.header.size)
+        if len(header) < self.header.size:
+            return None
+        expires_at, key_size = self.header.unpack(header)
+        key = file.read(key_size)
+        if len(key) < key_size:
+            return None
+        try:
+            return key.decode(), expires_at
+        except UnicodeDecodeError:
+            return None
+
+    def write(self, key: str, value: bytes, expires_at: float) -> None:
+        encoded_key = key.encode()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(self.header.pack(expires_at, len(encoded_key)))
+                file.write(encoded_key)
+                file.write(value)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def scan(
+        self,
+    ) -> typing.Iterator[typing.Tuple[str, typing.Optional[typing.Tuple[str, float]]]]:
+        """Yield the path and the header of each value file."""
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name.startswith("."):
+                    continue
+                try:
+                    with open(entry.path, "rb") as file:
+                        header = self.read_header(file)
+                except FileNotFoundError:
+                    continue
+                yield entry.path, header
+
+    def prune(self) -> None:
+        """Remove the expired and unreadable values."""
+        now = self.clock()
+        for path, header in self.scan():
+            if header is not None and header[1] > now:
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            self.stats.expirations += 1
+
+    def remove_prefix(self, prefix: str) -> int:
+        """Remove the values whose key starts with ``prefix``."""
+        removed = 0
+        for path, header in self.scan():
+            if header is None or not header[0].startswith(prefix):
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            removed += 1
+        return removed
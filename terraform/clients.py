@@ -0,0 +1,111 @@
+import dataclasses
+import inspect
+import logging
+import typing
+
+if typing.TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolLimits:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+
+
+@dataclasses.dataclass
+class PoolStats:
+    max_connections: int
+    requests_total: int = 0
+    requests_in_flight: int = 0
+    peak_requests_in_flight: int = 0
+
+    @property
+    def utilization(self) -> float:
+        return self.requests_in_flight / self.max_connections
+
+    @property
+    def peak_utilization(self) -> float:
+        return self.peak_requests_in_flight / self.max_connections
+
+
+class ClientRegistry:
+    """
+    Clients shared by all the resources of a provider.
+
+    HTTP clients pool their connections and keep them alive across RPCs. The
+    registry is replaced on each Configure, and its clients are closed on Stop and
+    when the plugin shuts down.
+    """
+
+    def __init__(self, *, limits: PoolLimits = PoolLimits()):
+        self.limits = limits
+        self.clients: typing.Dict[str, typing.Any] = {}
+        self.stats: typing.Dict[str, PoolStats] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.clients
+
+    def __getitem__(self, name: str) -> typing.Any:
+        return self.clients[name]
+
+    def add(self, name: str, client: typing.Any) -> typing.Any:
+        """
+        Register a client created by provider code, to be closed with the registry.
+        """
+        self.clients[name] = client
+        return client
+
+    def http(self, name: str = "default", **kwargs) -> "httpx.AsyncClient":
+        """
+        Return the pooled HTTP client called ``name``, creating it on first use.
+
+        Keyword arguments are passed to ``httpx.AsyncClient`` when the client is
+        created. This requires the ``httpx`` package.
+        """
+        if name in self.clients:
+            return self.clients[name]
+
+        import httpx
+
+        from terraform import transports
+
+        limits = httpx.Limits(
+            max_connections=self.limits.max_connections,
+            max_keepalive_connections=self.limits.max_keepalive_connections,
+            keepalive_expiry=self.limits.keepalive_expiry,
+        )
+        stats = PoolStats(max_connections=self.limits.max_connections)
+        transport = transports.TrackingTransport(
+            kwargs.pop("transport", None) or httpx.AsyncHTTPTransport(limits=limits),
+            stats,
+        )
+
+        self.stats[name] = stats
+        return self.add(
+            name, httpx.AsyncClient(limits=limits, transport=transport, **kwargs)
+        )
+
+    async def close(self) -> None:
+        clients, self.clients = self.clients, {}
+        for name, client in clients.items():
+            close = getattr(client, "aclose", None) or getattr(client, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Failed to close client %s", name)
+
+        for name, stats in self.stats.items():
+            logger.info(
+                "HTTP client %s: %d requests, peak pool utilization %.0f%%",
+                name,
+                stats.requests_total,
+                stats.peak_utilization * 100,
+            )
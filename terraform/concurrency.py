@@ -0,0 +1,187 @@
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import logging
+import time
+import typing
+
+from terraform import ratelimit
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class AdaptiveLimits:
+    initial_limit: int = 8
+    min_limit: int = 1
+    max_limit: int = 64
+    # The limit grows by increase per saturated call and is multiplied by
+    # decrease_factor on throttling or when latency exceeds latency_tolerance
+    # times the median
+    increase: float = 1.0
+    decrease_factor: float = 0.5
+    latency_tolerance: float = 2.0
+    latency_window: int = 200
+
+
+@dataclasses.dataclass
+class LimiterStats:
+    limit: int
+    in_flight: int
+    waiting: int
+    latency_p50: typing.Optional[float]
+    latency_p90: typing.Optional[float]
+    latency_p99: typing.Optional[float]
+
+
+class LatencyWindow:
+    """Latencies of the most recent calls."""
+
+    def __init__(self, size: int):
+        self.samples: typing.Deque[float] = collections.deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, latency: float) -> None:
+        self.samples.append(latency)
+
+    def percentile(self, percentile: float) -> typing.Optional[float]:
+        if not self.samples:
+            return None
+        samples = sorted(self.samples)
+        index = min(int(len(samples) * percentile / 100), len(samples) - 1)
+        return samples[index]
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted with additive increase, multiplicative decrease.
+
+    The limit grows while calls that used all of it complete with stable
+    latencies, and shrinks when a call is throttled by the backend or its latency
+    spikes above the recent median of calls with the same key, such as the hook
+    called, so that slow operations are not compared with fast ones.
+    """
+
+    def __init__(
+        self,
+        limits: AdaptiveLimits = AdaptiveLimits(),
+        *,
+        name: str = "",
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.limits = limits
+        self.name = name
+        self.clock = clock
+        self.limit = float(limits.initial_limit)
+        self.in_flight = 0
+        self.waiters: typing.Deque[asyncio.Future] = collections.deque()
+        self.latencies = LatencyWindow(limits.latency_window)
+        # Latency baselines per call key
+        self.baselines: typing.Dict[typing.Hashable, LatencyWindow] = {}
+        self.last_decrease = float("-inf")
+
+    def stats(self) -> LimiterStats:
+        return LimiterStats(
+            limit=int(self.limit),
+            in_flight=self.in_flight,
+            waiting=len(self.waiters),
+            latency_p50=self.latencies.percentile(50),
+            latency_p90=self.latencies.percentile(90),
+            latency_p99=self.latencies.percentile(99),
+        )
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release()
+            else:
+                self.waiters.remove(future)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.wake()
+
+    def wake(self) -> None:
+        while self.waiters and self.in_flight < int(self.limit):
+            future = self.waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, key: typing.Hashable = None):
+        """
+        Hold a slot for the duration of a call, and adjust the limit after it
+        compared to the previous calls with the same ``key``.
+        """
+        await self.acquire()
+        saturated = self.in_flight >= int(self.limit)
+        started = self.clock()
+        throttled = False
+        try:
+            yield
+        except ratelimit.RateLimitedError:
+            throttled = True
+            raise
+        finally:
+            self.update(
+                self.clock() - started,
+                throttled=throttled,
+                saturated=saturated,
+                key=key,
+            )
+            self.release()
+
+    def update(
+        self,
+        latency: float,
+        *,
+        throttled: bool,
+        saturated: bool,
+        key: typing.Hashable = None,
+    ) -> None:
+        if key not in self.baselines:
+            self.baselines[key] = LatencyWindow(self.limits.latency_window)
+        baseline = self.baselines[key]
+
+        median = baseline.percentile(50)
+        spiked = (
+            median is not None
+            and len(baseline) >= 10
+            and latency > median * self.limits.latency_tolerance
+        )
+        baseline.add(latency)
+        self.latencies.add(latency)
+
+        if throttled or spiked:
+            # Calls started before a decrease complete after it; only back off
+            # once per median latency
+            now = self.clock()
+            if now - self.last_decrease < (median or 0):
+                return
+            self.last_decrease = now
+            self.limit = max(
+                self.limits.min_limit, self.limit * self.limits.decrease_factor
+            )
+            logger.debug(
+                "Lowered concurrency limit of %s to %d (%s)",
+                self.name,
+                self.limit,
+                "throttled" if throttled else f"latency {latency:.3f}s",
+            )
+        elif saturated:
+            self.limit = min(self.limits.max_limit, self.limit + self.limits.increase)
+            self.wake()
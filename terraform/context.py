@@ -0,0 +1,74 @@
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import time
+import typing
+
+from terraform import scheduling
+
+
+class StoppedError(Exception):
+    """Raised when an operation is interrupted because Terraform asked to stop."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when an operation runs past its deadline."""
+
+
+@dataclasses.dataclass(frozen=True)
+class RequestContext:
+    """
+    State of the RPC that a hook is running for, available to the hook and the
+    helpers it calls through ``current()``.
+    """
+
+    stop_event: typing.Optional[asyncio.Event] = None
+    # time.monotonic() value by which the operation must complete
+    deadline: typing.Optional[float] = None
+    # Class the hooks of the operation are scheduled in
+    priority: scheduling.Priority = scheduling.Priority.READ
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def time_remaining(self) -> typing.Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def check(self) -> None:
+        """
+        Raise ``StoppedError`` if the operation should stop, or
+        ``DeadlineExceededError`` if it is past its deadline.
+        """
+        if self.stopped:
+            raise StoppedError("Operation was stopped")
+        if self.time_remaining() == 0:
+            raise DeadlineExceededError("Operation deadline exceeded")
+
+    async def wait_stopped(self) -> None:
+        if self.stop_event is None:
+            await asyncio.Future()
+        else:
+            await self.stop_event.wait()
+
+
+current_context: contextvars.ContextVar[RequestContext] = contextvars.ContextVar(
+    "current_context", default=RequestContext()
+)
+
+
+def current() -> RequestContext:
+    return current_context.get()
+
+
+@contextlib.contextmanager
+def use(request_context: RequestContext) -> typing.Iterator[RequestContext]:
+    """Make ``request_context`` the current context within the block."""
+    token = current_context.set(request_context)
+    try:
+        yield request_context
+    finally:
+        current_context.reset(token)
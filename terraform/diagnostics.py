@@ -155,6 +155,14 @@ class Diagnostics:
 
         return cls(diagnostics=list(walk(errors, [])))
 
+    @classmethod
+    def from_exception(cls, exc: BaseException, *, severity=Severity.ERROR):
+        return cls(
+            diagnostics=[
+                Diagnostic(severity=severity, summary=str(exc) or type(exc).__name__)
+            ]
+        )
+
     def include_attribute_path_in_summary(self) -> "Diagnostics":
         return dataclasses.replace(
             self,
@@ -0,0 +1,78 @@
+import asyncio
+import typing
+
+T = typing.TypeVar("T")
+
+DONE = object()
+
+
+class PageError(typing.NamedTuple):
+    exception: BaseException
+
+
+async def prefetch(
+    pages: typing.AsyncIterator[T], *, lookahead: int = 1
+) -> typing.AsyncGenerator[T, None]:
+    """
+    Iterate over ``pages`` while up to ``lookahead`` next pages are fetched in the
+    background, so that fetching overlaps with processing the current page.
+    """
+    if lookahead < 1:
+        async for page in pages:
+            yield page
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=lookahead)
+
+    async def produce():
+        try:
+            async for page in pages:
+                await queue.put(page)
+        except Exception as exc:
+            await queue.put(PageError(exc))
+        else:
+            await queue.put(DONE)
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            page = await queue.get()
+            if page is DONE:
+                break
+            if isinstance(page, PageError):
+                raise page.exception
+            yield page
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        aclose = getattr(pages, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def collect(
+    pages: typing.AsyncIterator[typing.Iterable[T]],
+    *,
+    limit: typing.Optional[int] = None,
+    predicate: typing.Optional[typing.Callable[[T], bool]] = None,
+) -> typing.List[T]:
+    """
+    Return the items of ``pages`` that match ``predicate``, stopping as soon as
+    ``limit`` items were found without fetching further pages.
+    """
+    items: typing.List[T] = []
+    if limit is not None and limit <= 0:
+        return items
+
+    async for page in pages:
+        for item in page:
+            if predicate is not None and not predicate(item):
+                continue
+            items.append(item)
+            if limit is not None and len(items) >= limit:
+                return items
+    return items
@@ -1,24 +1,50 @@
 import asyncio
 import base64
 import contextlib
+import dataclasses
+import functools
 import json
 import logging
 import os
+import random
+import socket
 import ssl
 import sys
 import tempfile
+import time
 import typing
 
+import grpclib.const
+import grpclib.exceptions
 import grpclib.server
 from grpclib.utils import graceful_exit
 
-from terraform import diagnostics, schemas, settings, unknowns, utils
+from terraform import (
+    batching,
+    caching,
+    clients,
+    concurrency,
+    context,
+    diagnostics,
+    pagination,
+    scheduling,
+    schemas,
+    settings,
+    singleflight,
+    unknowns,
+    utils,
+)
 from terraform.grpc_controller import GRPCController
 from terraform.grpc_stdio import GRPCStdio
 from terraform.protos import tfplugin5_1_grpc, tfplugin5_1_pb2
 
+if typing.TYPE_CHECKING:
+    from cryptography import x509
+
 logger = logging.getLogger(__name__)
 
+R = typing.TypeVar("R")
+
 
 class ProviderService(tfplugin5_1_grpc.ProviderBase):
     def __init__(
@@ -29,22 +55,321 @@ class ProviderService(tfplugin5_1_grpc.ProviderBase):
     ):
         self.provider = provider
         self.shutdown_event = shutdown_event
+        self.batchers: typing.Dict[typing.Tuple[str, str], batching.Batcher] = {}
+        self.data_source_reads = singleflight.Group()
+        self.limiters: typing.Dict[schemas.Resource, concurrency.AdaptiveLimiter] = {}
+        self.scheduler = scheduling.Scheduler(provider.max_concurrent_hooks)
+        self.prefetches = caching.PrefetchCache(
+            max_entries=provider.prefetch_max_entries
+        )
+        self.stop_event = asyncio.Event()
+        self.tasks: typing.Set[asyncio.Future] = set()
+        # Tasks of the RPCs being handled, and their method names
+        self.rpcs: typing.Dict[asyncio.Future, str] = {}
+        self.draining = False
+        self.schema: typing.Optional[tfplugin5_1_pb2.GetProviderSchema.Response] = None
+
+    def __mapping__(self) -> typing.Dict[str, grpclib.const.Handler]:
+        return {
+            path: handler._replace(func=self.track_rpc(handler.func))
+            for path, handler in super().__mapping__().items()
+        }
+
+    def track_rpc(
+        self, func: typing.Callable[[grpclib.server.Stream], typing.Awaitable[None]]
+    ) -> typing.Callable[[grpclib.server.Stream], typing.Awaitable[None]]:
+        """
+        Wrap an RPC handler to keep track of it until its response is sent, and
+        to reject it with a retryable status once the plugin is draining.
+        """
+
+        @functools.wraps(func)
+        async def handler(stream: grpclib.server.Stream) -> None:
+            if self.draining and func.__name__ != "Stop":
+                raise grpclib.exceptions.GRPCError(
+                    grpclib.const.Status.UNAVAILABLE, "Provider is shutting down"
+                )
+
+            task = asyncio.current_task()
+            assert task is not None
+            self.rpcs[task] = func.__name__
+            try:
+                await func(stream)
+            except asyncio.CancelledError:
+                if not self.draining:
+                    raise
+                raise grpclib.exceptions.GRPCError(
+                    grpclib.const.Status.UNAVAILABLE, "Operation was abandoned"
+                ) from None
+            finally:
+                del self.rpcs[task]
+
+        return handler
+
+    async def stop(self) -> typing.Set[asyncio.Future]:
+        """
+        Cancel the running hooks and wait for them to clean up within the stop
+        grace period of the provider. Return the hooks still running after it.
+        """
+        self.stop_event.set()
+        self.prefetches.clear()
+
+        tasks = set(self.tasks)
+        if not tasks:
+            return set()
+
+        logger.info("Stopping %d running operations", len(tasks))
+        for task in tasks:
+            task.cancel()
+
+        _, pending = await asyncio.wait(tasks, timeout=self.provider.stop_grace_period)
+        return pending
+
+    async def drain(self, timeout: float) -> typing.List[str]:
+        """
+        Reject new RPCs and wait up to ``timeout`` seconds for the running ones to
+        send their responses.
+
+        The hooks of the RPCs left are then stopped as with Stop, so that they
+        still respond with the state reached so far. Return the method names of the
+        RPCs that were interrupted.
+        """
+        self.draining = True
+        running = dict(self.rpcs)
+        if not running:
+            return []
+
+        logger.info("Draining %d running operations", len(running))
+        _, pending = await asyncio.wait(list(running), timeout=timeout)
+        if pending:
+            await self.stop()
+            _, stuck = await asyncio.wait(
+                pending, timeout=self.provider.stop_grace_period
+            )
+            for task in stuck:
+                task.cancel()
+
+            logger.warning(
+                "Drained %d operations, interrupted %d (%s) of which %d without "
+                "a response",
+                len(running) - len(pending),
+                len(pending),
+                ", ".join(sorted(running[task] for task in pending)),
+                len(stuck),
+            )
+        else:
+            logger.info("Drained %d operations", len(running))
+
+        return sorted(running[task] for task in pending)
+
+    def reset(self) -> None:
+        """
+        Reset the state of the previous Terraform run, so that a reattached plugin
+        serves the next run with its schema, clients and caches still warm.
+        """
+        self.stop_event = asyncio.Event()
+        self.prefetches.clear()
+        self.draining = False
+
+    def get_batcher(self, resource: schemas.Resource, hook: str) -> batching.Batcher:
+        """Return the batcher that merges concurrent calls to a batch ``hook``."""
+        key = (resource.name, hook)
+        if key not in self.batchers:
+            batch_hook = getattr(resource, hook)
+
+            priority = context.current().priority
+
+            async def func(items):
+                # The batch is shared by requests with different deadlines
+                batch_context = context.RequestContext(
+                    stop_event=self.stop_event, priority=priority
+                )
+                with context.use(batch_context):
+                    errors = await self.run_hook(resource, batch_hook, items)
+                if errors is None:
+                    return items
+                return [
+                    item if error is None else error
+                    for item, error in zip(items, errors)
+                ]
+
+            self.batchers[key] = batching.Batcher(
+                func, window=resource.batch_window, max_size=resource.batch_max_size
+            )
+        return self.batchers[key]
+
+    async def call_hook(
+        self, resource: schemas.Resource, hook: str, data: schemas.ResourceData
+    ) -> None:
+        """
+        Call a resource ``hook`` such as ``create`` or ``read``, going through its
+        ``batch_`` counterpart when the resource implements one, within the rate
+        limits and concurrency limit of the resource.
+        """
+        batch_hook = f"batch_{hook}"
+        if resource.implements(batch_hook):
+            await self.wait_with_deadline(
+                self.get_batcher(resource, batch_hook).submit(data),
+                f"{resource.name} {hook}",
+            )
+        else:
+            await self.run_hook(resource, getattr(resource, hook), data=data)
+
+    async def run_hook(
+        self,
+        resource: schemas.Resource,
+        func: typing.Callable[..., typing.Awaitable[R]],
+        *args,
+        **kwargs,
+    ) -> R:
+        """
+        Run a hook of ``resource`` within its rate limits and its adaptive
+        concurrency limit, once the scheduler admits it in the priority class of the
+        request.
+
+        The hook runs in its own task, which is cancelled when Terraform calls Stop
+        or when the deadline of the request passes. It can reach the stop state and
+        the deadline of the request through ``context.current()``.
+        """
+        request_context = dataclasses.replace(
+            context.current(), stop_event=self.stop_event
+        )
+        request_context.check()
+
+        limiter = self.get_limiter(resource)
+        hook = getattr(func, "__name__", "hook")
+
+        rate_limiter = self.provider.rate_limiter
+
+        async def limited() -> R:
+            async with self.scheduler.slot(
+                resource.name,
+                priority=request_context.priority,
+                weight=resource.schedule_weight,
+                capacity=lambda: int(limiter.limit),
+            ):
+                async with limiter.slot(hook):
+                    # The token is taken last, so that calls released together
+                    # by the concurrency limits still start at the configured rate
+                    return await rate_limiter.attempt(
+                        resource.rate_limit_scope, func, *args, **kwargs
+                    )
+
+        with context.use(request_context):
+            # Backoff between retries happens outside of the concurrency slots
+            task = asyncio.ensure_future(rate_limiter.retry(limited))
+
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        try:
+            with context.use(request_context):
+                return await self.wait_with_deadline(task, f"{resource.name} {hook}")
+        except asyncio.CancelledError:
+            if task.cancelled() and request_context.stopped:
+                raise context.StoppedError("Operation was stopped") from None
+            raise
+
+    async def wait_with_deadline(
+        self, awaitable: typing.Awaitable[R], description: str
+    ) -> R:
+        """Wait for ``awaitable``, cancelling it at the deadline of the request."""
+        try:
+            return await asyncio.wait_for(awaitable, context.current().time_remaining())
+        except asyncio.TimeoutError:
+            raise context.DeadlineExceededError(
+                f"{description} did not complete before its deadline"
+            ) from None
+
+    def request_context(
+        self,
+        stream: grpclib.server.Stream,
+        *,
+        timeout: typing.Optional[float] = None,
+        priority: scheduling.Priority = scheduling.Priority.READ,
+    ) -> context.RequestContext:
+        """
+        Return the context of a request, with the earliest of the gRPC deadline set
+        by Terraform and the operation ``timeout``.
+        """
+        now = time.monotonic()
+        deadlines = []
+        if stream.deadline is not None:
+            deadlines.append(now + stream.deadline.time_remaining())
+        if timeout is not None:
+            deadlines.append(now + timeout)
+
+        return context.RequestContext(
+            stop_event=self.stop_event,
+            deadline=min(deadlines, default=None),
+            priority=priority,
+        )
+
+    def validate_timeouts(
+        self, resource: schemas.Resource, config: typing.Optional[typing.Dict]
+    ) -> diagnostics.Diagnostics:
+        if resource.timeouts is None:
+            return diagnostics.Diagnostics()
+
+        timeout_diagnostics = []
+        for operation in resource.timeouts.operations:
+            try:
+                resource.get_timeout(operation, config)
+            except ValueError as exc:
+                timeout_diagnostics.append(
+                    diagnostics.Diagnostic(
+                        severity=diagnostics.Severity.ERROR,
+                        summary=str(exc),
+                        attribute_paths=[
+                            diagnostics.AttributePathStepAttribute(
+                                settings.TIMEOUTS_KEY
+                            ),
+                            diagnostics.AttributePathStepAttribute(operation),
+                        ],
+                    )
+                )
+        return diagnostics.Diagnostics(diagnostics=timeout_diagnostics)
+
+    def get_limiter(self, resource: schemas.Resource) -> concurrency.AdaptiveLimiter:
+        if resource not in self.limiters:
+            self.limiters[resource] = concurrency.AdaptiveLimiter(
+                self.provider.concurrency_limits, name=resource.name
+            )
+        return self.limiters[resource]
+
+    def concurrency_stats(self) -> typing.Dict[str, concurrency.LimiterStats]:
+        """Return the current concurrency limit and latencies per resource type."""
+        return {
+            resource.name: limiter.stats()
+            for resource, limiter in self.limiters.items()
+        }
+
+    def scheduler_stats(self) -> typing.Dict[str, scheduling.QueueStats]:
+        """Return the queue metrics of the scheduler per priority class."""
+        return self.scheduler.stats()
+
+    def get_schema(self) -> tfplugin5_1_pb2.GetProviderSchema.Response:
+        """Return the schema of the provider, encoded on first use."""
+        if self.schema is None:
+            self.schema = tfplugin5_1_pb2.GetProviderSchema.Response(
+                provider=tfplugin5_1_pb2.Schema(
+                    block=self.provider.to_block().to_proto()
+                ),
+                resource_schemas={
+                    name: resource.to_proto()
+                    for name, resource in self.provider.resources.items()
+                },
+                data_source_schemas={
+                    name: resource.to_proto()
+                    for name, resource in self.provider.data_sources.items()
+                },
+            )
+        return self.schema
 
     async def GetSchema(self, stream: grpclib.server.Stream) -> None:
         await stream.recv_message()
 
-        response = tfplugin5_1_pb2.GetProviderSchema.Response(
-            provider=tfplugin5_1_pb2.Schema(block=self.provider.to_block().to_proto()),
-            resource_schemas={
-                name: resource.to_proto()
-                for name, resource in self.provider.resources.items()
-            },
-            data_source_schemas={
-                name: resource.to_proto()
-                for name, resource in self.provider.data_sources.items()
-            },
-        )
-        await stream.send_message(response)
+        await stream.send_message(self.get_schema())
 
     async def PrepareProviderConfig(self, stream: grpclib.server.Stream) -> None:
         request = await stream.recv_message()
@@ -71,6 +396,9 @@ class ProviderService(tfplugin5_1_grpc.ProviderBase):
         prepared_config = resource.dump(config)
         errors = resource.validate(prepared_config)
         resource_diagnostics = diagnostics.Diagnostics.from_schema_errors(errors)
+        resource_diagnostics.diagnostics.extend(
+            self.validate_timeouts(resource, config).diagnostics
+        )
 
         response = tfplugin5_1_pb2.ValidateResourceTypeConfig.Response(
             diagnostics=resource_diagnostics.to_proto()
@@ -86,6 +414,9 @@ class ProviderService(tfplugin5_1_grpc.ProviderBase):
         prepared_config = resource.dump(config)
         errors = resource.validate(prepared_config)
         resource_diagnostics = diagnostics.Diagnostics.from_schema_errors(errors)
+        resource_diagnostics.diagnostics.extend(
+            self.validate_timeouts(resource, config).diagnostics
+        )
 
         response = tfplugin5_1_pb2.ValidateDataSourceConfig.Response(
             diagnostics=resource_diagnostics.to_proto()
@@ -110,13 +441,73 @@ class ProviderService(tfplugin5_1_grpc.ProviderBase):
 
         config = utils.from_dynamic_value_proto(request.config)
         self.provider.terraform_version = request.terraform_version or "0.11+compatible"
+        self.provider.config_digest = utils.digest(request.config.msgpack)
+        await self.provider.clients.close()
+        self.provider.clients = clients.ClientRegistry(limits=self.provider.pool_limits)
         self.provider.configure(config)
+        # Cached results may depend on the previous provider configuration
+        self.provider.data_source_cache.invalidate()
+        # Each Terraform run configures the provider first. Reattached plugins
+        # are not shut down between runs, so a run stopped by Stop does not
+        # leave the next one stopped
+        self.reset()
 
         response = tfplugin5_1_pb2.Configure.Response()
         await stream.send_message(response)
 
     async def ReadResource(self, stream: grpclib.server.Stream) -> None:
-        pass
+        request = await stream.recv_message()
+
+        resource = self.provider.resources[request.type_name]
+        current_state = utils.from_dynamic_value_proto(request.current_state)
+        private = json.loads(request.private) if request.private else None
+
+        # Keep the current state intact in case the read fails
+        data = schemas.ResourceData(dict(current_state), private=dict(private or {}))
+        resource_diagnostics = diagnostics.Diagnostics()
+
+        timeout = resource.get_timeout("read", current_state)
+        changed = True
+
+        try:
+            with context.use(self.request_context(stream, timeout=timeout)):
+                if data.version_token is not None and resource.implements(
+                    "read_if_changed"
+                ):
+                    changed = await self.run_hook(
+                        resource, resource.read_if_changed, data=data
+                    )
+
+                if changed:
+                    await self.call_hook(resource, "read", data)
+        except Exception as exc:
+            logger.exception("Failed to read %s", request.type_name)
+            changed = True
+            new_state = current_state
+            resource_diagnostics = diagnostics.Diagnostics.from_exception(exc)
+        else:
+            # A resource that no longer exists is removed from the state
+            if changed and data.get(settings.ID_KEY):
+                new_state = dict(resource.dump(data))
+                if resource.timeouts is not None:
+                    new_state[settings.TIMEOUTS_KEY] = current_state.get(
+                        settings.TIMEOUTS_KEY
+                    )
+            else:
+                new_state = None
+
+        if changed:
+            response = tfplugin5_1_pb2.ReadResource.Response(
+                new_state=utils.to_dynamic_value_proto(new_state),
+                diagnostics=resource_diagnostics.to_proto(),
+                private=json.dumps(data.private or private).encode("ascii"),
+            )
+        else:
+            # Return the prior state as received, without encoding it again
+            response = tfplugin5_1_pb2.ReadResource.Response(
+                new_state=request.current_state, private=request.private
+            )
+        await stream.send_message(response)
 
     async def PlanResourceChange(self, stream: grpclib.server.Stream) -> None:
         request = await stream.recv_message()
@@ -136,15 +527,20 @@ class ProviderService(tfplugin5_1_grpc.ProviderBase):
             planned_state = proposed_new_state
             planned_private = prior_private
         else:
-            # TODO: implement me
             planned_state = proposed_new_state
 
             if create:
                 planned_state = unknowns.set_unknowns(
                     planned_state, resource.to_block()
                 )
-            else:
-                raise NotImplementedError
+            elif planned_state != prior_state:
+                self.start_prefetch(resource, prior_state, prior_private)
+
+            if resource.timeouts is not None:
+                # Blocks cannot be computed, so an unset timeouts block stays null
+                planned_state[settings.TIMEOUTS_KEY] = (config or {}).get(
+                    settings.TIMEOUTS_KEY
+                )
 
             planned_private = prior_private
 
@@ -154,6 +550,36 @@ class ProviderService(tfplugin5_1_grpc.ProviderBase):
         )
         await stream.send_message(response)
 
+    def start_prefetch(
+        self,
+        resource: schemas.Resource,
+        prior_state: typing.Dict[str, typing.Any],
+        prior_private: typing.Optional[typing.Dict[str, typing.Any]],
+    ) -> None:
+        """
+        Call the prefetch hook of a resource planned for update in the background,
+        for the apply to pick up its result.
+        """
+        id = prior_state.get(settings.ID_KEY)
+        if not resource.implements("prefetch") or not id:
+            return
+
+        data = schemas.ResourceData(
+            dict(prior_state), private=dict(prior_private or {})
+        )
+        prefetch_context = context.RequestContext(
+            stop_event=self.stop_event,
+            deadline=time.monotonic() + resource.prefetch_ttl,
+            # The apply that follows the plan waits for the result
+            priority=scheduling.Priority.PLAN,
+        )
+
+        async def prefetch() -> typing.Any:
+            with context.use(prefetch_context):
+                return await self.run_hook(resource, resource.prefetch, data=data)
+
+        self.prefetches.start((resource.name, id), prefetch, ttl=resource.prefetch_ttl)
+
     async def ApplyResourceChange(self, stream: grpclib.server.Stream) -> None:
         request = await stream.recv_message()
 
@@ -168,50 +594,286 @@ class ProviderService(tfplugin5_1_grpc.ProviderBase):
         destroy = planned_state is None
         create = prior_state is None
 
+        resource_diagnostics = diagnostics.Diagnostics()
+
         if destroy:
-            new_state = planned_state
-            private = planned_private
-        else:
-            # TODO: implement me
-            data = schemas.ResourceData(planned_state)
+            data = schemas.ResourceData(dict(prior_state))
 
-            if create:
-                await resource.create(data=data)
+            timeout = resource.get_timeout("delete", prior_state)
+
+            try:
+                with context.use(
+                    self.request_context(
+                        stream, timeout=timeout, priority=scheduling.Priority.MUTATION
+                    )
+                ):
+                    await self.call_hook(resource, "delete", data)
+            except Exception as exc:
+                logger.exception("Failed to delete %s", request.type_name)
+                new_state = prior_state
+                resource_diagnostics = diagnostics.Diagnostics.from_exception(exc)
             else:
-                raise NotImplementedError
+                new_state = planned_state
 
-            new_state = dict(data)
             private = planned_private
+        else:
+            data = schemas.ResourceData(
+                planned_state, private=dict(planned_private or {})
+            )
+
+            operation = "create" if create else "update"
+            timeout = resource.get_timeout(operation, config)
+
+            failed = False
+            try:
+                with context.use(
+                    self.request_context(
+                        stream, timeout=timeout, priority=scheduling.Priority.MUTATION
+                    )
+                ):
+                    if not create:
+                        data.prefetched = await self.prefetches.pop(
+                            (resource.name, prior_state.get(settings.ID_KEY)),
+                            timeout=context.current().time_remaining(),
+                        )
+                    await self.call_hook(resource, operation, data)
+            except Exception as exc:
+                logger.exception("Failed to %s %s", operation, request.type_name)
+                failed = True
+                resource_diagnostics = diagnostics.Diagnostics.from_exception(exc)
+
+            if failed and not create and not data.partial:
+                # The planned values of a failed update were not applied, and
+                # keeping the prior state lets the next plan retry the change
+                new_state = prior_state
+                private = planned_private
+            else:
+                # A partially created resource is kept so that it can be cleaned
+                # up, with the values it did not set null, as no value stays
+                # unknown after an apply
+                id = data.get(settings.ID_KEY)
+                if id is not None and id != unknowns.UNKNOWN:
+                    new_state = unknowns.remove_unknowns(dict(data))
+                else:
+                    new_state = None
+                private = data.private or planned_private
 
         response = tfplugin5_1_pb2.ApplyResourceChange.Response(
             new_state=utils.to_dynamic_value_proto(new_state),
             private=json.dumps(private).encode("ascii"),
+            diagnostics=resource_diagnostics.to_proto(),
         )
         await stream.send_message(response)
 
     async def ImportResourceState(self, stream: grpclib.server.Stream) -> None:
-        pass
+        request = await stream.recv_message()
+
+        resource = self.provider.resources[request.type_name]
+        timeout = resource.get_timeout("read", None)
+        imported_resources = []
+        import_diagnostics = diagnostics.Diagnostics()
+
+        with context.use(self.request_context(stream, timeout=timeout)):
+            try:
+                items = await self.run_hook(
+                    resource, resource.import_state, id=request.id
+                )
+            except Exception as exc:
+                logger.exception("Failed to import %s", request.type_name)
+                items = []
+                import_diagnostics = diagnostics.Diagnostics.from_exception(exc)
+
+            # Reads run concurrently, bounded by the concurrency limit of the
+            # resource, and are batched when it implements batch_read
+            results = await asyncio.gather(
+                *(self.call_hook(resource, "read", data) for data in items),
+                return_exceptions=True,
+            )
+
+        for data, result in zip(items, results):
+            if isinstance(result, BaseException):
+                logger.error(
+                    "Failed to read imported %s", request.type_name, exc_info=result
+                )
+                import_diagnostics.diagnostics.extend(
+                    diagnostics.Diagnostics.from_exception(result).diagnostics
+                )
+            elif not data.get(settings.ID_KEY):
+                import_diagnostics.diagnostics.append(
+                    diagnostics.Diagnostic(
+                        severity=diagnostics.Severity.ERROR,
+                        summary="Cannot import non-existent remote object",
+                        detail=(
+                            f"The {request.type_name} object with ID {request.id} "
+                            "does not exist."
+                        ),
+                    )
+                )
+            else:
+                imported_resources.append(
+                    tfplugin5_1_pb2.ImportResourceState.ImportedResource(
+                        type_name=request.type_name,
+                        state=utils.to_dynamic_value_proto(dict(resource.dump(data))),
+                        private=json.dumps(data.private or None).encode("ascii"),
+                    )
+                )
+
+        response = tfplugin5_1_pb2.ImportResourceState.Response(
+            imported_resources=imported_resources,
+            diagnostics=import_diagnostics.to_proto(),
+        )
+        await stream.send_message(response)
 
     async def ReadDataSource(self, stream: grpclib.server.Stream) -> None:
         request = await stream.recv_message()
 
         resource = self.provider.data_sources[request.type_name]
-        config = utils.from_dynamic_value_proto(request.config)
-        data = schemas.ResourceData(config)
+        key = (request.type_name, utils.digest(request.config.msgpack))
+
+        state = None
+        if resource.cache_ttl:
+            state = self.provider.data_source_cache.get(key)
+
+        if state is not None:
+            response = tfplugin5_1_pb2.ReadDataSource.Response(
+                state=tfplugin5_1_pb2.DynamicValue(msgpack=state)
+            )
+        else:
+            timeout = resource.get_timeout(
+                "read", utils.from_dynamic_value_proto(request.config)
+            )
+
+            # Identical concurrent reads share a single call to the read hook
+            with context.use(self.request_context(stream, timeout=timeout)):
+                response = await self.data_source_reads.do(
+                    key,
+                    functools.partial(
+                        self.read_data_source, resource, key, request.config
+                    ),
+                )
+        await stream.send_message(response)
+
+    async def read_data_source(
+        self,
+        resource: schemas.Resource,
+        key: typing.Tuple[str, str],
+        config: tfplugin5_1_pb2.DynamicValue,
+    ) -> tfplugin5_1_pb2.ReadDataSource.Response:
+        if not resource.cache_ttl:
+            return await self.call_data_source_read(resource, config)
+
+        response = None
+
+        async def fill() -> typing.Optional[bytes]:
+            nonlocal response
+            response = await self.call_data_source_read(resource, config)
+            # Failed reads are not cached
+            return None if response.diagnostics else response.state.msgpack
 
-        await resource.read(data=data)
+        state = await self.get_or_fill_cache(
+            self.provider.cache_key(*key), fill, ttl=resource.cache_ttl
+        )
+        if state is None:
+            return response
+
+        self.provider.data_source_cache.set(key, state, ttl=resource.cache_ttl)
+        return tfplugin5_1_pb2.ReadDataSource.Response(
+            state=tfplugin5_1_pb2.DynamicValue(msgpack=state)
+        )
+
+    async def call_data_source_read(
+        self, resource: schemas.Resource, config: tfplugin5_1_pb2.DynamicValue
+    ) -> tfplugin5_1_pb2.ReadDataSource.Response:
+        data = schemas.ResourceData(utils.from_dynamic_value_proto(config))
+
+        try:
+            if resource.implements("read_pages"):
+                await self.run_hook(resource, self.read_pages, resource, data)
+            else:
+                await self.run_hook(resource, resource.read, data=data)
+        except Exception as exc:
+            logger.exception("Failed to read %s", resource.name)
+            return tfplugin5_1_pb2.ReadDataSource.Response(
+                diagnostics=diagnostics.Diagnostics.from_exception(exc).to_proto()
+            )
 
         if not data.get("id"):
             data.set_id("-")
 
         data = resource.dump(data)
-        response = tfplugin5_1_pb2.ReadDataSource.Response(
+        return tfplugin5_1_pb2.ReadDataSource.Response(
             state=utils.to_dynamic_value_proto(dict(data))
         )
-        await stream.send_message(response)
+
+    async def read_pages(
+        self, resource: schemas.Resource, data: schemas.ResourceData
+    ) -> None:
+        """
+        Collect the items of a paginated data source into its page attribute,
+        fetching the next pages while the current one is filtered.
+        """
+        if resource.page_attribute is None:
+            raise ValueError(
+                f"{resource.name} implements read_pages without a page_attribute"
+            )
+
+        pages = pagination.prefetch(
+            resource.read_pages(data), lookahead=resource.page_lookahead
+        )
+        try:
+            data[resource.page_attribute] = await pagination.collect(
+                pages,
+                limit=resource.page_limit,
+                predicate=functools.partial(resource.filter_item, data),
+            )
+        finally:
+            await pages.aclose()
+
+    async def get_or_fill_cache(
+        self,
+        key: str,
+        fill: typing.Callable[[], typing.Awaitable[typing.Optional[bytes]]],
+        *,
+        ttl: float,
+    ) -> typing.Optional[bytes]:
+        """
+        Look ``key`` up in the persistent and shared caches of the provider, calling
+        ``fill`` on a miss. When a shared cache is set up, only one plugin process
+        on the host fills a given key at a time.
+        """
+        persistent_cache = self.provider.persistent_cache
+        shared_cache = self.provider.shared_cache
+
+        if persistent_cache is not None:
+            value = await persistent_cache.get(key)
+            if value is not None:
+                return value
+
+        if shared_cache is not None:
+            value = await shared_cache.get_or_fill(key, fill, ttl=ttl)
+        else:
+            value = await fill()
+
+        if value is not None and persistent_cache is not None:
+            await persistent_cache.set(key, value, ttl=ttl)
+        return value
 
     async def Stop(self, stream: grpclib.server.Stream) -> None:
-        pass
+        await stream.recv_message()
+
+        error = ""
+        pending = await self.stop()
+        if pending:
+            error = (
+                f"{len(pending)} operations did not stop "
+                f"within {self.provider.stop_grace_period} seconds"
+            )
+            logger.warning(error)
+
+        await self.provider.clients.close()
+
+        response = tfplugin5_1_pb2.Stop.Response(Error=error)
+        await stream.send_message(response)
 
 
 async def write_handshake_response(
@@ -219,94 +881,359 @@ async def write_handshake_response(
     file: typing.TextIO,
     core_protocol_version: int = settings.CORE_PROTOCOL_VERSION,
     protocol_version: int,
-    port: int,
-    certificate,
+    network: str = "tcp",
+    address: str,
+    certificate: typing.Optional["x509.Certificate"],
 ):
     """
-    Write the protocol versions, service name, address and certificate to the IO
-    for the client.
+    Write the protocol versions, network address, service name and certificate to
+    the IO for the client. The certificate is omitted for plaintext servers.
     """
-    certificate_der = utils.encode_certificate_der(certificate)
-    certificate_b64 = base64.b64encode(certificate_der).decode("ascii").rstrip("=")
+    fields = [
+        str(core_protocol_version),
+        str(protocol_version),
+        network,
+        address,
+        "grpc",
+    ]
+    if certificate is not None:
+        certificate_der = utils.encode_certificate_der(certificate)
+        fields.append(base64.b64encode(certificate_der).decode("ascii").rstrip("="))
 
-    file.write(
-        "{}|{}|{}|{}|{}|{}\n".format(
-            core_protocol_version,
-            protocol_version,
-            "tcp",
-            f"127.0.0.1:{port}",
-            "grpc",
-            certificate_b64,
-        )
-    )
+    file.write("|".join(fields) + "\n")
     file.flush()
 
 
 async def wait_shutdown_event(
-    *, server: grpclib.server.Server, shutdown_event: asyncio.Event
+    *,
+    server: grpclib.server.Server,
+    shutdown_event: asyncio.Event,
+    service: typing.Optional[ProviderService] = None,
 ):
-    """Wait for a shutdown event to close the server."""
+    """
+    Wait for a shutdown event to close the server, once the running operations of
+    ``service`` were drained.
+    """
     await shutdown_event.wait()
+    if service is not None:
+        await service.drain(service.provider.shutdown_grace_period)
     server.close()
 
 
-async def run_server(*, provider: schemas.Provider):
-    if os.getenv(settings.MAGIC_COOKIE_KEY) != settings.MAGIC_COOKIE_VALUE:
+async def write_reattach_config(
+    *,
+    file: typing.TextIO,
+    provider_address: str,
+    protocol_version: int,
+    network: str = "tcp",
+    address: str,
+):
+    """
+    Write the ``TF_REATTACH_PROVIDERS`` value with which Terraform runs use the
+    running plugin as the provider at ``provider_address`` instead of launching it.
+    """
+    config = {
+        provider_address: {
+            "Protocol": "grpc",
+            "ProtocolVersion": protocol_version,
+            "Pid": os.getpid(),
+            # Terraform does not kill test plugins when it exits
+            "Test": True,
+            "Addr": {"Network": network, "String": address},
+        }
+    }
+    file.write(
+        "Provider started, to attach Terraform set the environment variable:\n\n"
+        f"\tTF_REATTACH_PROVIDERS='{json.dumps(config)}'\n"
+    )
+    file.flush()
+
+
+async def wait_reattached_runs(
+    *,
+    server: grpclib.server.Server,
+    shutdown_event: asyncio.Event,
+    service: ProviderService,
+):
+    """
+    Drain ``service`` and reset its per-run state on each shutdown event instead of
+    closing the server, until the server is closed by a signal.
+    """
+    closed = asyncio.ensure_future(server.wait_closed())
+    while True:
+        shutdown = asyncio.ensure_future(shutdown_event.wait())
+        await asyncio.wait([closed, shutdown], return_when=asyncio.FIRST_COMPLETED)
+        if closed.done():
+            shutdown.cancel()
+            return
+
+        shutdown_event.clear()
+        await service.drain(service.provider.shutdown_grace_period)
+        service.reset()
+        logger.info("Terraform run finished, waiting for the next one")
+
+
+def create_ssl_context(
+    certificate_data: utils.CertificatePrivateKey, client_cert: typing.Optional[str]
+) -> ssl.SSLContext:
+    """
+    Return the server TLS context, loading the key material from memory where
+    possible so that it never reaches the disk.
+    """
+    key = utils.encode_private_key(certificate_data.private_key)
+    certificate = utils.encode_certificate_pem(certificate_data.certificate)
+    with utils.memory_file(key) as keyfile, utils.memory_file(certificate) as certfile:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS)
+        ctx.verify_mode = ssl.CERT_REQUIRED
+        ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+        ctx.load_cert_chain(certfile=certfile, keyfile=keyfile)
+        ctx.load_verify_locations(cadata=client_cert)
+    return ctx
+
+
+def bind_tcp_socket(min_port: int, max_port: int) -> socket.socket:
+    """
+    Bind a listening loopback socket to a free port of the range, probed in random
+    order so that plugins launched at the same time do not contend for the same
+    ports. The operating system picks the port when no range is given.
+    """
+    if min_port == max_port == 0:
+        ports: typing.Sequence[int] = [0]
+    else:
+        ports = random.sample(range(min_port, max_port + 1), max_port - min_port + 1)
+
+    for port in ports:
+        # With the protocol given, asyncio disables Nagle's algorithm on the
+        # accepted connections
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        if os.name == "posix":
+            # As asyncio does, so that ports in TIME_WAIT can be reused
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", port))
+            # Another process may have bound the port too, as SO_REUSEADDR allows
+            # until one of them listens
+            sock.listen()
+        except OSError:
+            sock.close()
+        else:
+            return sock
+    raise OSError(f"No free port between {min_port} and {max_port}")
+
+
+async def start_tcp_server(
+    server: grpclib.server.Server,
+    *,
+    min_port: int,
+    max_port: int,
+    ssl_context: typing.Optional[ssl.SSLContext],
+) -> str:
+    """Start ``server`` on a free port of the range, returning its address."""
+    sock = bind_tcp_socket(min_port, max_port)
+    host, port = sock.getsockname()
+    await server.start(sock=sock, ssl=ssl_context)
+    return f"{host}:{port}"
+
+
+async def start_unix_server(
+    server: grpclib.server.Server,
+    *,
+    directory: str,
+    ssl_context: typing.Optional[ssl.SSLContext],
+) -> str:
+    """
+    Start ``server`` on a Unix socket in ``directory``, which should only be
+    accessible to the current user, returning its path.
+    """
+    path = os.path.join(directory, "plugin.sock")
+    await server.start(path=path, ssl=ssl_context)
+    os.chmod(path, 0o600)
+    return path
+
+
+def use_uvloop() -> bool:
+    """
+    Make uvloop the event loop of the asyncio runs started from now on, if it is
+    installed. Return whether it is.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop is not installed, using the asyncio event loop")
+        return False
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def use_eager_tasks(loop: asyncio.AbstractEventLoop) -> bool:
+    """
+    Make the tasks created on ``loop`` from now on run eagerly until they first
+    suspend, so that RPCs completing without I/O skip a loop iteration. Return
+    whether the Python version, 3.12 or later, supports it.
+    """
+    eager_task_factory = getattr(asyncio, "eager_task_factory", None)
+    if eager_task_factory is None:
+        logger.warning("Eager tasks require Python 3.12 or later")
+        return False
+
+    loop.set_task_factory(eager_task_factory)
+    return True
+
+
+async def run_server(
+    *,
+    provider: schemas.Provider,
+    reattach: typing.Optional[str] = None,
+    eager_tasks: bool = False,
+):
+    # With a provider source address to reattach as, the plugin is started by hand
+    # and serves Terraform runs until it is interrupted
+    if (
+        reattach is None
+        and os.getenv(settings.MAGIC_COOKIE_KEY) != settings.MAGIC_COOKIE_VALUE
+    ):
         logger.error(
             "This is a Terraform plugin. "
             "These are not meant to be executed directly."
         )
         sys.exit(1)
 
+    if eager_tasks:
+        use_eager_tasks(asyncio.get_running_loop())
+
     min_port = int(os.getenv("PLUGIN_MIN_PORT") or 0)
     max_port = int(os.getenv("PLUGIN_MAX_PORT") or 0)
     if min_port > max_port:
         logger.error("PLUGIN_MIN_PORT value is greater than PLUGIN_MAX_PORT value")
         sys.exit(1)
 
-    certificate_data = utils.generate_certificate()
-    with contextlib.ExitStack() as stack:
-        keyfile = stack.enter_context(tempfile.NamedTemporaryFile())
-        keyfile.write(utils.encode_private_key(certificate_data.private_key))
-        keyfile.flush()
-        certfile = stack.enter_context(tempfile.NamedTemporaryFile())
-        certfile.write(utils.encode_certificate_pem(certificate_data.certificate))
-        certfile.flush()
+    network = os.getenv(settings.NETWORK_ENV) or provider.network
+    if network not in ("tcp", "unix"):
+        logger.error("Unsupported network %r, expected tcp or unix", network)
+        sys.exit(1)
 
-        client_cert = os.getenv("PLUGIN_CLIENT_CERT")
-        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS)
-        ctx.verify_mode = ssl.CERT_REQUIRED
-        ctx.minimum_version = ssl.TLSVersion.TLSv1_2
-        ctx.load_cert_chain(certfile=certfile.name, keyfile=keyfile.name)
-        ctx.load_verify_locations(cadata=client_cert)
+    curve = os.getenv(settings.CERTIFICATE_CURVE_ENV) or provider.certificate_curve
+    if curve not in utils.CERTIFICATE_CURVES:
+        logger.error(
+            "Unsupported certificate curve %r, expected one of %s",
+            curve,
+            ", ".join(utils.CERTIFICATE_CURVES),
+        )
+        sys.exit(1)
 
-        shutdown_event = asyncio.Event()
-
-        handlers = [
-            GRPCController(shutdown_event=shutdown_event),
-            GRPCStdio(),
-            ProviderService(provider=provider, shutdown_event=shutdown_event),
-        ]
-        server = grpclib.server.Server(handlers)
-        with graceful_exit([server]):
-            port = min_port
-            while port <= max_port:
-                try:
-                    await server.start("127.0.0.1", port, ssl=ctx)
-                except OSError:
-                    port += 1
-                else:
-                    break
+    # Terraform only sends its certificate when it requests mutual TLS; the server
+    # is plaintext otherwise. Reattached plugins are always plaintext
+    client_cert = None if reattach else os.getenv("PLUGIN_CLIENT_CERT")
+    certificate_future = None
+    if client_cert:
+        # The key is generated on a worker thread while the rest of the startup
+        # runs
+        certificate_future = asyncio.get_running_loop().run_in_executor(
+            None, utils.generate_certificate, curve
+        )
+
+    if provider.persistent_cache is None:
+        provider.persistent_cache = caching.PersistentCache.from_env(
+            max_bytes=provider.persistent_cache_max_bytes
+        )
+    if provider.shared_cache is None:
+        provider.shared_cache = caching.SharedCache.from_env()
+
+    shutdown_event = asyncio.Event()
+
+    service = ProviderService(provider=provider, shutdown_event=shutdown_event)
+    service.get_schema()
+    handlers = [
+        GRPCController(shutdown_event=shutdown_event),
+        GRPCStdio(),
+        service,
+    ]
+
+    certificate = None
+    ctx = None
+    if certificate_future is not None:
+        certificate_data = await certificate_future
+        certificate = certificate_data.certificate
+        ctx = create_ssl_context(certificate_data, client_cert)
+
+    server = grpclib.server.Server(handlers)
+    with graceful_exit([server]), contextlib.ExitStack() as stack:
+        if network == "unix":
+            directory = stack.enter_context(
+                tempfile.TemporaryDirectory(
+                    prefix="plugin", dir=os.getenv("PLUGIN_UNIX_SOCKET_DIR")
+                )
+            )
+            address = await start_unix_server(
+                server, directory=directory, ssl_context=ctx
+            )
+        else:
+            try:
+                address = await start_tcp_server(
+                    server, min_port=min_port, max_port=max_port, ssl_context=ctx
+                )
+            except OSError as exc:
+                logger.error("Failed to start the server: %s", exc)
+                sys.exit(1)
 
+        if reattach is not None:
+            await write_reattach_config(
+                file=sys.stdout,
+                provider_address=reattach,
+                protocol_version=settings.PROTOCOL_VERSION,
+                network=network,
+                address=address,
+            )
+            await wait_reattached_runs(
+                server=server, shutdown_event=shutdown_event, service=service
+            )
+        else:
             await write_handshake_response(
                 file=sys.stdout,
                 protocol_version=settings.PROTOCOL_VERSION,
-                port=port,
-                certificate=certificate_data.certificate,
+                network=network,
+                address=address,
+                certificate=certificate,
             )
-            await wait_shutdown_event(server=server, shutdown_event=shutdown_event)
-            await server.wait_closed()
+            await wait_shutdown_event(
+                server=server, shutdown_event=shutdown_event, service=service
+            )
+        await server.wait_closed()
+
+    await provider.clients.close()
+    if provider.persistent_cache is not None:
+        await provider.persistent_cache.close()
 
 
-def run(*, provider: schemas.Provider):
-    asyncio.run(run_server(provider=provider))
+def run(
+    *,
+    provider: schemas.Provider,
+    reattach: typing.Optional[str] = None,
+    event_loop: typing.Optional[str] = None,
+    eager_tasks: typing.Optional[bool] = None,
+):
+    """
+    Serve ``provider`` until Terraform shuts it down.
+
+    ``event_loop`` is either ``"asyncio"`` or ``"uvloop"``, which falls back to
+    asyncio when uvloop is not installed, and ``eager_tasks`` runs the RPC handlers
+    eagerly on Python 3.12 or later. They default to the ``TF_PLUGIN_EVENT_LOOP``
+    and ``TF_PLUGIN_EAGER_TASKS`` environment variables.
+    """
+    if event_loop is None:
+        event_loop = os.getenv(settings.EVENT_LOOP_ENV) or "asyncio"
+    if eager_tasks is None:
+        eager_tasks = os.getenv(settings.EAGER_TASKS_ENV) == "1"
+
+    if event_loop not in ("asyncio", "uvloop"):
+        logger.error(
+            "Unsupported event loop %r, expected asyncio or uvloop", event_loop
+        )
+        sys.exit(1)
+    if event_loop == "uvloop":
+        use_uvloop()
+
+    asyncio.run(
+        run_server(provider=provider, reattach=reattach, eager_tasks=eager_tasks)
+    )
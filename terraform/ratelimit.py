@@ -0,0 +1,212 @@
+import asyncio
+import dataclasses
+import random
+import time
+import typing
+
+R = typing.TypeVar("R")
+
+
+class RateLimitedError(Exception):
+    """
+    Raised by hooks when the backend rejected a request for exceeding its rate
+    limits. ``retry_after`` is the delay in seconds the backend asked for, if any.
+    """
+
+    def __init__(
+        self,
+        message: str = "Rate limited",
+        *,
+        retry_after: typing.Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(
+    value: typing.Optional[str], *, now: typing.Optional[float] = None
+) -> typing.Optional[float]:
+    """Parse a Retry-After header, given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    import email.utils
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if now is None:
+        now = time.time()
+    return max(retry_at.timestamp() - now, 0.0)
+
+
+@dataclasses.dataclass(frozen=True)
+class RateLimit:
+    rate: float
+    burst: int = 1
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second, holding up to ``burst``.
+
+    Tokens are reserved when ``acquire`` is called, so that waiters are served in
+    order and the rate is never exceeded.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        *,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Reserve ``tokens`` and return how long to wait until they are available."""
+        self.refill()
+        self.tokens -= tokens
+        return max(-self.tokens / self.rate, 0.0)
+
+    async def acquire(self, tokens: float = 1) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, delay: float) -> None:
+        """Hold every acquirer back for at least ``delay`` seconds."""
+        self.refill()
+        self.tokens = min(self.tokens, -delay * self.rate)
+
+
+def backoff(
+    attempt: int,
+    *,
+    base_delay: float,
+    max_delay: float,
+    retry_after: typing.Optional[float] = None,
+) -> float:
+    """
+    Return the delay before retry number ``attempt``, with full jitter. A delay
+    requested by the backend is honored, with jitter added on top so that waiters
+    do not retry all at once.
+    """
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+    if retry_after is not None:
+        delay = retry_after + delay / 2
+    return delay
+
+
+async def retry(
+    func: typing.Callable[[], typing.Awaitable[R]],
+    *,
+    attempts: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+) -> R:
+    """Call ``func``, retrying with backoff when it raises ``RateLimitedError``."""
+    for attempt in range(attempts):
+        try:
+            return await func()
+        except RateLimitedError as exc:
+            if attempt + 1 >= attempts:
+                raise
+            await asyncio.sleep(
+                backoff(
+                    attempt,
+                    base_delay=base_delay,
+                    max_delay=max_delay,
+                    retry_after=exc.retry_after,
+                )
+            )
+    raise AssertionError("unreachable")
+
+
+class RateLimiter:
+    """
+    Token buckets per named scope, shared by all the hooks of a provider.
+
+    Scopes without a configured limit are not throttled.
+    """
+
+    def __init__(
+        self,
+        limits: typing.Optional[typing.Mapping[str, RateLimit]] = None,
+        *,
+        retry_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.buckets: typing.Dict[str, TokenBucket] = {}
+        self.retry_attempts = retry_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        for scope, limit in (limits or {}).items():
+            self.set_limit(scope, limit)
+
+    def set_limit(self, scope: str, limit: RateLimit) -> None:
+        self.buckets[scope] = TokenBucket(limit.rate, limit.burst)
+
+    async def acquire(self, scope: typing.Optional[str], tokens: float = 1) -> None:
+        bucket = self.buckets.get(scope) if scope is not None else None
+        if bucket is not None:
+            await bucket.acquire(tokens)
+
+    async def attempt(
+        self,
+        scope: typing.Optional[str],
+        func: typing.Callable[..., typing.Awaitable[R]],
+        *args,
+        **kwargs,
+    ) -> R:
+        """
+        Call ``func`` once, after taking a token of ``scope``. A retry-after hint
+        holds back every caller of the scope, not only the one that received it.
+        """
+        await self.acquire(scope)
+        try:
+            return await func(*args, **kwargs)
+        except RateLimitedError as exc:
+            bucket = self.buckets.get(scope) if scope is not None else None
+            if bucket is not None and exc.retry_after is not None:
+                bucket.pause(exc.retry_after)
+            raise
+
+    async def retry(self, func: typing.Callable[[], typing.Awaitable[R]]) -> R:
+        """Call ``func``, retrying it with the backoff configured for this limiter."""
+        return await retry(
+            func,
+            attempts=self.retry_attempts,
+            base_delay=self.base_delay,
+            max_delay=self.max_delay,
+        )
+
+    async def call(
+        self,
+        scope: typing.Optional[str],
+        func: typing.Callable[..., typing.Awaitable[R]],
+        *args,
+        **kwargs,
+    ) -> R:
+        """
+        Call ``func`` within the rate limits of ``scope``, retrying it with backoff
+        when the backend still rejects it.
+        """
+        return await self.retry(lambda: self.attempt(scope, func, *args, **kwargs))
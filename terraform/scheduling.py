@@ -0,0 +1,179 @@
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import enum
+import itertools
+import time
+import typing
+
+
+class Priority(enum.IntEnum):
+    """
+    Classes of hook calls, admitted in this order when the provider is saturated.
+
+    Stop does not run hooks and never waits behind them.
+    """
+
+    # Refreshes, data source reads and imports
+    READ = 0
+    # Work started by planning, such as prefetches for updates
+    PLAN = 1
+    # Creates, updates and deletes
+    MUTATION = 2
+
+
+@dataclasses.dataclass
+class QueueStats:
+    queued: int = 0
+    running: int = 0
+    admitted: int = 0
+    # Seconds spent queued by the admitted calls
+    wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+    @property
+    def mean_wait_time(self) -> float:
+        return self.wait_time / self.admitted if self.admitted else 0.0
+
+
+@dataclasses.dataclass
+class Waiter:
+    flow: typing.Hashable
+    priority: Priority
+    start: float
+    sequence: int
+    capacity: typing.Optional[typing.Callable[[], int]]
+    future: asyncio.Future
+    enqueued: float
+
+
+class Scheduler:
+    """
+    Admits hook calls up to ``max_concurrency`` at a time, by priority class.
+
+    Within a class, flows such as resource types share the capacity in proportion
+    to their weights, with start-time fair queueing. A flow can also bound its own
+    concurrency, in which case its calls do not hold back those of other flows.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 64,
+        *,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.clock = clock
+        self.running = 0
+        self.flow_running: typing.Counter[typing.Hashable] = collections.Counter()
+        self.waiters: typing.List[Waiter] = []
+        self.virtual_time: typing.Dict[Priority, float] = collections.defaultdict(float)
+        self.finish_tags: typing.Dict[
+            typing.Tuple[Priority, typing.Hashable], float
+        ] = {}
+        self.queue_stats = {priority: QueueStats() for priority in Priority}
+        self.sequence = itertools.count()
+
+    def stats(self) -> typing.Dict[str, QueueStats]:
+        """Return the queue metrics per priority class."""
+        return {
+            priority.name.lower(): dataclasses.replace(stats)
+            for priority, stats in self.queue_stats.items()
+        }
+
+    async def acquire(
+        self,
+        flow: typing.Hashable,
+        *,
+        priority: Priority = Priority.READ,
+        weight: float = 1.0,
+        capacity: typing.Optional[typing.Callable[[], int]] = None,
+    ) -> None:
+        key = (priority, flow)
+        start = max(self.virtual_time[priority], self.finish_tags.get(key, 0.0))
+        self.finish_tags[key] = start + 1 / weight
+
+        waiter = Waiter(
+            flow=flow,
+            priority=priority,
+            start=start,
+            sequence=next(self.sequence),
+            capacity=capacity,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued=self.clock(),
+        )
+        self.waiters.append(waiter)
+        self.queue_stats[priority].queued += 1
+        self.dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just before the cancellation
+                self.release(flow, priority=priority)
+            else:
+                self.waiters.remove(waiter)
+                self.queue_stats[priority].queued -= 1
+            raise
+
+    def release(self, flow: typing.Hashable, *, priority: Priority) -> None:
+        self.running -= 1
+        self.flow_running[flow] -= 1
+        if not self.flow_running[flow]:
+            del self.flow_running[flow]
+        self.queue_stats[priority].running -= 1
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        waiters = sorted(
+            self.waiters,
+            key=lambda waiter: (waiter.priority, waiter.start, waiter.sequence),
+        )
+        for waiter in waiters:
+            if self.running >= self.max_concurrency:
+                break
+            if waiter.future.done():
+                # Cancelled, and removed by its task once it resumes
+                continue
+            if (
+                waiter.capacity is not None
+                and self.flow_running[waiter.flow] >= waiter.capacity()
+            ):
+                continue
+            self.admit(waiter)
+
+    def admit(self, waiter: Waiter) -> None:
+        self.waiters.remove(waiter)
+        self.running += 1
+        self.flow_running[waiter.flow] += 1
+        self.virtual_time[waiter.priority] = max(
+            self.virtual_time[waiter.priority], waiter.start
+        )
+
+        wait_time = self.clock() - waiter.enqueued
+        stats = self.queue_stats[waiter.priority]
+        stats.queued -= 1
+        stats.running += 1
+        stats.admitted += 1
+        stats.wait_time += wait_time
+        stats.max_wait_time = max(stats.max_wait_time, wait_time)
+
+        waiter.future.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(
+        self,
+        flow: typing.Hashable,
+        *,
+        priority: Priority = Priority.READ,
+        weight: float = 1.0,
+        capacity: typing.Optional[typing.Callable[[], int]] = None,
+    ):
+        """Hold a slot of ``flow`` for the duration of a call."""
+        await self.acquire(flow, priority=priority, weight=weight, capacity=capacity)
+        try:
+            yield
+        finally:
+            self.release(flow, priority=priority)
@@ -7,7 +7,15 @@ import typing
 
 import marshmallow
 
-from terraform import fields, settings
+from terraform import (
+    caching,
+    clients,
+    concurrency,
+    fields,
+    ratelimit,
+    settings,
+    utils,
+)
 from terraform.protos import tfplugin5_1_pb2
 
 
@@ -94,6 +102,58 @@ class NestedBlock:
         )
 
 
+@dataclasses.dataclass(frozen=True)
+class Timeouts:
+    """
+    Default timeouts of the operations of a resource, in seconds. Each operation
+    with a default can be overridden from the ``timeouts`` block of a resource
+    configuration, with a duration such as ``"30m"``.
+    """
+
+    create: typing.Optional[float] = None
+    read: typing.Optional[float] = None
+    update: typing.Optional[float] = None
+    delete: typing.Optional[float] = None
+
+    @property
+    def operations(self) -> typing.List[str]:
+        return [
+            field.name
+            for field in dataclasses.fields(self)
+            if getattr(self, field.name) is not None
+        ]
+
+    def to_block(self) -> NestedBlock:
+        return NestedBlock(
+            nesting=NestingMode.SINGLE,
+            block=Block(
+                attributes={
+                    operation: Attribute(type="string", optional=True)
+                    for operation in self.operations
+                }
+            ),
+        )
+
+    def get(
+        self, operation: str, values: typing.Optional[typing.Dict[str, typing.Any]]
+    ) -> typing.Optional[float]:
+        """
+        Return the timeout of ``operation``, as configured in the ``timeouts`` block
+        of ``values`` or by default. Unknown values, such as variables during
+        validation, fall back to the default.
+        """
+        from terraform import unknowns
+
+        block = (values or {}).get(settings.TIMEOUTS_KEY)
+        if block is None or block == unknowns.UNKNOWN:
+            return getattr(self, operation)
+
+        configured = block.get(operation)
+        if configured and configured != unknowns.UNKNOWN:
+            return utils.parse_duration(configured)
+        return getattr(self, operation)
+
+
 def encode_type(obj: typing.Any) -> bytes:
     return json.dumps(obj, separators=(",", ":")).encode("ascii")
 
@@ -207,6 +267,13 @@ class Schema(marshmallow.Schema, metaclass=SchemaMeta):
 @dataclasses.dataclass
 class ResourceData(typing.MutableMapping):
     data: typing.Dict[str, typing.Any] = dataclasses.field(default_factory=dict)
+    # Provider-only state stored by Terraform alongside the resource
+    private: typing.Dict[str, typing.Any] = dataclasses.field(default_factory=dict)
+    # Result of Resource.prefetch for the update being applied, if it completed
+    prefetched: typing.Any = dataclasses.field(default=None, compare=False)
+    # Set by an update hook that fails after applying part of the change, so that
+    # the values of data are recorded instead of the prior state
+    partial: bool = dataclasses.field(default=False, compare=False)
 
     def __getitem__(self, key: str) -> typing.Any:
         return self.data[key]
@@ -226,13 +293,79 @@ class ResourceData(typing.MutableMapping):
     def set_id(self, value: str) -> None:
         self[settings.ID_KEY] = value
 
+    @property
+    def version_token(self) -> typing.Optional[str]:
+        return self.private.get(settings.VERSION_TOKEN_KEY)
+
+    def set_version_token(self, value: typing.Optional[str]) -> None:
+        """
+        Store the version of the remote object, such as an ETag, in the private
+        state, for ``Resource.read_if_changed`` to compare against on refresh.
+        """
+        self.private[settings.VERSION_TOKEN_KEY] = value
+
 
 class Resource(Schema):
     name: str
     provider: "Provider"
 
+    # Concurrent calls to the batch hooks are collected for up to batch_window
+    # seconds, or until batch_max_size items are waiting
+    batch_window: float = 0.01
+    batch_max_size: int = 100
+
+    # Results of a data source are cached for cache_ttl seconds when set
+    cache_ttl: typing.Optional[float] = None
+
+    # Data sources implementing read_pages store the matching items of every page
+    # in page_attribute, keeping at most page_limit of them. Up to page_lookahead
+    # pages are fetched ahead of the one being processed
+    page_attribute: typing.Optional[str] = None
+    page_limit: typing.Optional[int] = None
+    page_lookahead: int = 1
+
+    # Share of the provider scheduler that this resource type gets within a
+    # priority class, relative to the other types
+    schedule_weight: float = 1.0
+
+    # Results of prefetch are used by an apply starting within prefetch_ttl seconds
+    # of the plan
+    prefetch_ttl: float = 60.0
+
+    # Hooks are throttled by the provider rate limiter scope with this name
+    rate_limit_scope: typing.Optional[str] = None
+
+    # Adds a timeouts block to the schema of the resource when set
+    timeouts: typing.Optional[Timeouts] = None
+
     id = fields.String(optional=True, computed=True)
 
+    def implements(self, hook: str) -> bool:
+        """Whether the optional ``hook`` method is overridden by this resource."""
+        return getattr(type(self), hook, None) is not getattr(Resource, hook, None)
+
+    def to_block(self) -> Block:
+        block = super().to_block()
+        if self.timeouts is not None:
+            block.block_types[settings.TIMEOUTS_KEY] = self.timeouts.to_block()
+        return block
+
+    def get_timeout(
+        self, operation: str, values: typing.Optional[typing.Dict[str, typing.Any]]
+    ) -> typing.Optional[float]:
+        if self.timeouts is None:
+            return None
+        return self.timeouts.get(operation, values)
+
+    async def invalidate_cache(self) -> None:
+        """Remove the cached results of this data source from every cache tier."""
+        self.provider.data_source_cache.invalidate(lambda key: key[0] == self.name)
+        prefix = self.provider.cache_key_prefix(self.name)
+        if self.provider.persistent_cache is not None:
+            await self.provider.persistent_cache.invalidate_prefix(prefix)
+        if self.provider.shared_cache is not None:
+            await self.provider.shared_cache.invalidate_prefix(prefix)
+
     def upgrade_state(
         self, *, state: typing.Dict[str, typing.Any], version: int
     ) -> typing.Dict[str, typing.Any]:
@@ -253,6 +386,82 @@ class Resource(Schema):
     async def exists(self, data: ResourceData):
         ...
 
+    async def prefetch(self, data: ResourceData) -> typing.Any:
+        """
+        Fetch what ``update`` needs from the remote object, such as its current
+        state, in the background once a plan shows that ``data`` will be updated.
+
+        The result is passed to ``update`` as ``data.prefetched`` when the apply
+        starts within ``prefetch_ttl`` seconds of the plan, the apply waiting for a
+        prefetch still running up to its own deadline. ``update`` must still work
+        when it is ``None``.
+        """
+        ...
+
+    async def import_state(self, id: str) -> typing.Sequence[ResourceData]:
+        """
+        Return the instances of this resource to import for ``id``, which are then
+        refreshed with ``read``. A single ID can import many instances.
+        """
+        return [ResourceData({settings.ID_KEY: id})]
+
+    def read_pages(
+        self, data: ResourceData
+    ) -> typing.AsyncIterator[typing.Sequence[typing.Any]]:
+        """
+        Async generator yielding the pages of a data source listing a collection,
+        used instead of ``read`` when implemented. ``data`` can be updated in place
+        with attributes other than ``page_attribute``.
+        """
+        raise NotImplementedError
+
+    def filter_item(self, data: ResourceData, item: typing.Any) -> bool:
+        """Whether an item yielded by ``read_pages`` is kept in the results."""
+        return True
+
+    async def read_if_changed(self, data: ResourceData) -> bool:
+        """
+        Cheaply check whether the remote object changed since ``data.version_token``
+        was stored, for example with a conditional request.
+
+        When this returns ``False``, refresh keeps the prior state as is without
+        calling ``read``. Only called when a version token was stored.
+        """
+        return True
+
+    async def batch_read(
+        self, items: typing.Sequence[ResourceData]
+    ) -> typing.Optional[typing.Sequence[typing.Optional[Exception]]]:
+        """
+        Read many instances of this resource with one backend call.
+
+        Each item is updated in place, as ``read`` would do. Clear the ID of an item
+        that no longer exists. Return ``None`` when every item succeeded, or one
+        exception (or ``None``) per item to fail only some of them.
+        """
+        ...
+
+    async def batch_create(
+        self, items: typing.Sequence[ResourceData]
+    ) -> typing.Optional[typing.Sequence[typing.Optional[Exception]]]:
+        """
+        Create many instances of this resource with one backend call.
+
+        Each item is updated in place with its new state, as ``create`` would do.
+        Errors are reported as in ``batch_read``.
+        """
+        ...
+
+    async def batch_delete(
+        self, items: typing.Sequence[ResourceData]
+    ) -> typing.Optional[typing.Sequence[typing.Optional[Exception]]]:
+        """
+        Delete many instances of this resource with one backend call.
+
+        Errors are reported as in ``batch_read``.
+        """
+        ...
+
 
 class Resources(typing.Mapping[str, Resource]):
     def __init__(
@@ -284,7 +493,26 @@ class Resources(typing.Mapping[str, Resource]):
 
 class Provider(Schema):
     name: str
+    version: typing.Optional[str] = None
     terraform_version: typing.Optional[str] = None
+    data_source_cache_max_entries: int = 1024
+    data_source_cache_max_bytes: int = 64 * 1024 * 1024
+    persistent_cache_max_bytes: int = 256 * 1024 * 1024
+    pool_limits: clients.PoolLimits = clients.PoolLimits()
+    rate_limits: typing.Mapping[str, ratelimit.RateLimit] = {}
+    concurrency_limits: concurrency.AdaptiveLimits = concurrency.AdaptiveLimits()
+    # Hook calls running at once across all resource types
+    max_concurrent_hooks: int = 64
+    prefetch_max_entries: int = 256
+    # Seconds that Stop waits for running operations to clean up
+    stop_grace_period: float = 10.0
+    # Seconds that shutdown waits for running operations to send their responses
+    shutdown_grace_period: float = 30.0
+    # Curve of the TLS certificate generated on each launch, one of
+    # utils.CERTIFICATE_CURVES; overridden by TF_PLUGIN_CERTIFICATE_CURVE
+    certificate_curve: str = "P-256"
+    # Network the plugin serves on, tcp or unix; overridden by TF_PLUGIN_NETWORK
+    network: str = "tcp"
 
     def __init__(
         self,
@@ -296,6 +524,18 @@ class Provider(Schema):
         self.resources = Resources(resources, provider=self)
         self.data_sources = Resources(data_sources, provider=self)
         self.config: typing.Dict[str, typing.Any] = {}
+        self.clients = clients.ClientRegistry(limits=self.pool_limits)
+        self.rate_limiter = ratelimit.RateLimiter(self.rate_limits)
+        # Cached states keyed by data source name and digest of the config
+        self.data_source_cache: caching.LRUCache[typing.Tuple[str, str]] = (
+            caching.LRUCache(
+                max_entries=self.data_source_cache_max_entries,
+                max_bytes=self.data_source_cache_max_bytes,
+            )
+        )
+        self.persistent_cache: typing.Optional[caching.PersistentCache] = None
+        self.shared_cache: typing.Optional[caching.SharedCache] = None
+        self.config_digest = ""
 
     def add_resource(self, resource: Resource):
         self.resources.add(resource)
@@ -305,3 +545,19 @@ class Provider(Schema):
 
     def configure(self, config: typing.Dict[str, typing.Any]):
         self.config = config
+
+    def cache_key(self, name: str, *parts: str) -> str:
+        """
+        Return a key for the persistent and shared caches, scoped to the version and the
+        configuration of this provider. Keys start with ``cache_key_prefix(name)``, so
+        that the entries of a data source can be invalidated together.
+        """
+        return self.cache_key_prefix(name) + utils.digest(
+            (self.version or "").encode(),
+            self.config_digest.encode(),
+            name.encode(),
+            *(part.encode() for part in parts),
+        )
+
+    def cache_key_prefix(self, name: str) -> str:
+        return f"{name}:"
@@ -0,0 +1,57 @@
+"""
+Serve a provider for Terraform runs to reattach to, keeping its schema, clients
+and caches warm between them::
+
+    python -m terraform.serve --reattach mymodule:provider \\
+        --address registry.terraform.io/acme/example
+"""
+
+import argparse
+import importlib
+import logging
+import typing
+
+from terraform import plugin, schemas
+
+
+def load_provider(target: str) -> schemas.Provider:
+    """Import the provider named by a ``module:attribute`` target."""
+    module_name, _, attribute = target.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(f"Expected a module:attribute target, got {target!r}")
+
+    provider: typing.Any = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        provider = getattr(provider, name)
+    if not isinstance(provider, schemas.Provider):
+        raise TypeError(f"{target} is not a provider")
+    return provider
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m terraform.serve")
+    parser.add_argument(
+        "--reattach",
+        required=True,
+        metavar="MODULE:PROVIDER",
+        help="the provider to serve",
+    )
+    parser.add_argument(
+        "--address",
+        required=True,
+        help="the source address Terraform knows the provider by, "
+        "such as registry.terraform.io/acme/example",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        provider = load_provider(args.reattach)
+    except (ImportError, AttributeError, TypeError, ValueError) as exc:
+        parser.error(str(exc))
+
+    logging.basicConfig(level=logging.INFO)
+    plugin.run(provider=provider, reattach=args.address)
+
+
+if __name__ == "__main__":
+    main()
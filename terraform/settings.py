@@ -3,3 +3,11 @@ PROTOCOL_VERSION = 5
 MAGIC_COOKIE_KEY = "TF_PLUGIN_MAGIC_COOKIE"
 MAGIC_COOKIE_VALUE = "d602bf8f470bc67ca7faa0386276bbdd4330efaf76d1a219cb4d6991ca9872b2"
 ID_KEY = "id"
+TIMEOUTS_KEY = "timeouts"
+VERSION_TOKEN_KEY = "version_token"
+CACHE_PATH_ENV = "TF_PLUGIN_CACHE_PATH"
+SHARED_CACHE_DIR_ENV = "TF_PLUGIN_SHARED_CACHE_DIR"
+CERTIFICATE_CURVE_ENV = "TF_PLUGIN_CERTIFICATE_CURVE"
+NETWORK_ENV = "TF_PLUGIN_NETWORK"
+EVENT_LOOP_ENV = "TF_PLUGIN_EVENT_LOOP"
+EAGER_TASKS_ENV = "TF_PLUGIN_EAGER_TASKS"
@@ -0,0 +1,48 @@
+import asyncio
+import typing
+
+R = typing.TypeVar("R")
+
+
+class Call:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class Group:
+    """
+    Deduplicate concurrent calls that share a key.
+
+    The first caller for a key starts ``func`` in its own task, and callers that
+    arrive while it is running wait for the same result. A waiter that is cancelled
+    does not cancel the call for the others; the call is only cancelled once every
+    waiter has gone away.
+    """
+
+    def __init__(self):
+        self.calls: typing.Dict[typing.Hashable, Call] = {}
+
+    async def do(
+        self, key: typing.Hashable, func: typing.Callable[[], typing.Awaitable[R]]
+    ) -> R:
+        call = self.calls.get(key)
+        if call is None:
+            call = Call(asyncio.ensure_future(func()))
+            self.calls[key] = call
+            call.task.add_done_callback(lambda _: self.forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                # The done callback only runs on a later iteration of the loop, and
+                # callers arriving until then must start a new call
+                self.forget(key, call)
+
+    def forget(self, key: typing.Hashable, call: Call) -> None:
+        if self.calls.get(key) is call:
+            del self.calls[key]
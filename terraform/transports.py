@@ -0,0 +1,47 @@
+import httpx
+
+from terraform import clients, context
+
+
+class TrackingTransport(httpx.AsyncBaseTransport):
+    """
+    HTTP transport that records pool usage of the transport it wraps, and bounds
+    the timeouts of requests by the deadline of the current request context.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: clients.PoolStats):
+        self.transport = transport
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        remaining = context.current().time_remaining()
+        if remaining is not None:
+            if remaining == 0:
+                raise context.DeadlineExceededError(
+                    f"Deadline exceeded before sending {request.method} {request.url}"
+                )
+            timeout = dict(request.extensions.get("timeout") or {})
+            for key in ("connect", "read", "write", "pool"):
+                value = timeout.get(key)
+                timeout[key] = remaining if value is None else min(value, remaining)
+            request.extensions["timeout"] = timeout
+
+        self.stats.requests_total += 1
+        self.stats.requests_in_flight += 1
+        self.stats.peak_requests_in_flight = max(
+            self.stats.peak_requests_in_flight, self.stats.requests_in_flight
+        )
+        try:
+            return await self.transport.handle_async_request(request)
+        finally:
+            self.stats.requests_in_flight -= 1
+
+    async def __aenter__(self):
+        await self.transport.__aenter__()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.transport.__aexit__(*args)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
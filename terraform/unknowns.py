@@ -53,3 +53,14 @@ def set_unknowns(
                 raise NotImplementedError
 
     return result
+
+
+def remove_unknowns(value: typing.Any) -> typing.Any:
+    """Return ``value`` with the unknown values left in it replaced by null."""
+    if value == UNKNOWN:
+        return None
+    if isinstance(value, dict):
+        return {key: remove_unknowns(inner_value) for key, inner_value in value.items()}
+    if isinstance(value, list):
+        return [remove_unknowns(inner_value) for inner_value in value]
+    return value
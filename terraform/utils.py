@@ -1,25 +1,62 @@
+import contextlib
 import datetime
+import hashlib
+import os
+import re
+import tempfile
 import typing
 
 import msgpack
-from cryptography import x509
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import ec
 
 from terraform.protos import tfplugin5_1_pb2
 
+if typing.TYPE_CHECKING:
+    from cryptography import x509
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
 
-class CertificatePrivateKey(typing.NamedTuple):
-    certificate: x509.Certificate
-    private_key: ec.EllipticCurvePrivateKeyWithSerialization
+    PrivateKey = typing.Union[
+        ec.EllipticCurvePrivateKeyWithSerialization, ed25519.Ed25519PrivateKey
+    ]
 
+# The certificate code imports cryptography on first use, which takes a large
+# share of the startup time of plugins that only serve plaintext
+CERTIFICATE_CURVES: typing.Dict[str, typing.Optional[str]] = {
+    # Curve names in cryptography.hazmat.primitives.asymmetric.ec
+    "P-256": "SECP256R1",
+    "P-384": "SECP384R1",
+    "P-521": "SECP521R1",
+    "Ed25519": None,
+}
 
-def generate_certificate() -> CertificatePrivateKey:
-    key = typing.cast(
-        ec.EllipticCurvePrivateKeyWithSerialization,
-        ec.generate_private_key(curve=ec.SECP521R1(), backend=default_backend()),
-    )
+
+class CertificatePrivateKey(typing.NamedTuple):
+    certificate: "x509.Certificate"
+    private_key: "PrivateKey"
+
+
+def generate_certificate(curve: str = "P-256") -> CertificatePrivateKey:
+    """
+    Generate a self-signed certificate for ``localhost`` with a key on ``curve``,
+    one of ``CERTIFICATE_CURVES``.
+    """
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+    try:
+        curve_name = CERTIFICATE_CURVES[curve]
+    except KeyError:
+        raise ValueError(f"Unsupported certificate curve: {curve!r}") from None
+
+    key: PrivateKey
+    if curve_name is None:
+        key = ed25519.Ed25519PrivateKey.generate()
+        # Ed25519 signatures embed their own hash
+        algorithm = None
+    else:
+        key = ec.generate_private_key(getattr(ec, curve_name)(), default_backend())
+        algorithm = hashes.SHA256()
 
     subject = issuer = x509.Name(
         [
@@ -65,31 +102,103 @@ def generate_certificate() -> CertificatePrivateKey:
         .add_extension(
             x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False,
         )
-        .sign(key, hashes.SHA256(), default_backend())
+        .sign(key, algorithm, default_backend())
     )
 
     return CertificatePrivateKey(certificate=certificate, private_key=key)
 
 
-def encode_certificate_pem(certificate: x509.Certificate) -> bytes:
+def encode_certificate_pem(certificate: "x509.Certificate") -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
     return certificate.public_bytes(serialization.Encoding.PEM)
 
 
-def encode_certificate_der(certificate: x509.Certificate) -> bytes:
+def encode_certificate_der(certificate: "x509.Certificate") -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
     return certificate.public_bytes(serialization.Encoding.DER)
 
 
-def encode_private_key(key: ec.EllipticCurvePrivateKeyWithSerialization) -> bytes:
+def encode_private_key(key: "PrivateKey") -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
     return key.private_bytes(
         encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        format=serialization.PrivateFormat.PKCS8,
         encryption_algorithm=serialization.NoEncryption(),
     )
 
 
+@contextlib.contextmanager
+def memory_file(data: bytes) -> typing.Iterator[str]:
+    """
+    Yield the path of a file holding ``data``, such as key material to pass to
+    ``ssl.SSLContext.load_cert_chain``.
+
+    On Linux the file only lives in memory, through ``memfd_create``. Elsewhere it
+    is a temporary file, removed on exit.
+    """
+    memfd_create = getattr(os, "memfd_create", None)
+    if memfd_create is None or not os.path.isdir("/proc/self/fd"):
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(data)
+            file.flush()
+            yield file.name
+        return
+
+    fd = memfd_create("terraform-plugin")
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+        yield f"/proc/self/fd/{fd}"
+    finally:
+        os.close(fd)
+
+
 def to_dynamic_value_proto(value: typing.Any) -> tfplugin5_1_pb2.DynamicValue:
     return tfplugin5_1_pb2.DynamicValue(msgpack=msgpack.packb(value))
 
 
 def from_dynamic_value_proto(proto: tfplugin5_1_pb2.DynamicValue) -> typing.Any:
     return msgpack.unpackb(proto.msgpack)
+
+
+def digest(*parts: bytes) -> str:
+    """Return a stable digest of ``parts``, suitable for use as a cache key."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(len(part).to_bytes(8, "big"))
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(h|ms|m|s|us|µs|ns)")
+DURATION_UNITS = {
+    "h": 3600.0,
+    "m": 60.0,
+    "s": 1.0,
+    "ms": 1e-3,
+    "us": 1e-6,
+    "µs": 1e-6,
+    "ns": 1e-9,
+}
+
+
+def parse_duration(value: str) -> float:
+    """Parse a duration in the format of Go's ``time.ParseDuration`` to seconds."""
+    if value == "0":
+        return 0.0
+
+    position = 0
+    seconds = 0.0
+    for match in DURATION_PATTERN.finditer(value):
+        if match.start() != position:
+            break
+        seconds += float(match.group(1)) * DURATION_UNITS[match.group(2)]
+        position = match.end()
+
+    if position == 0 or position != len(value):
+        raise ValueError(f"Invalid duration: {value!r}")
+    return seconds
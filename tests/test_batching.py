@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from terraform import batching
+
+
+@pytest.mark.asyncio
+async def test_batcher_merges_concurrent_submissions():
+    calls = []
+
+    async def func(items):
+        calls.append(items)
+        return [item * 2 for item in items]
+
+    batcher = batching.Batcher(func, window=0.01, max_size=10)
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_at_max_size():
+    calls = []
+
+    async def func(items):
+        calls.append(items)
+        return items
+
+    batcher = batching.Batcher(func, window=60, max_size=2)
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(4)))
+    assert results == [0, 1, 2, 3]
+    assert calls == [[0, 1], [2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_per_item_errors():
+    async def func(items):
+        return [ValueError(item) if item % 2 else item for item in items]
+
+    batcher = batching.Batcher(func, window=0.01, max_size=10)
+
+    results = await asyncio.gather(
+        *(batcher.submit(i) for i in range(3)), return_exceptions=True
+    )
+    assert results[0] == 0
+    assert isinstance(results[1], ValueError)
+    assert results[2] == 2
+
+
+@pytest.mark.asyncio
+async def test_batcher_skips_cancelled_waiters():
+    calls = []
+
+    async def func(items):
+        calls.append(items)
+        return items
+
+    batcher = batching.Batcher(func, window=0.01, max_size=10)
+
+    cancelled = asyncio.ensure_future(batcher.submit("cancelled"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await batcher.submit("kept") == "kept"
+    assert calls == [["kept"]]
@@ -0,0 +1,246 @@
+import asyncio
+
+import pytest
+
+from terraform import caching
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_expires_entries():
+    clock = FakeClock()
+    cache = caching.LRUCache(clock=clock)
+
+    cache.set("key", b"value", ttl=10)
+    assert cache.get("key") == b"value"
+
+    clock.now = 10
+    assert cache.get("key") is None
+    assert cache.stats == caching.CacheStats(hits=1, misses=1, expirations=1)
+
+
+def test_lru_cache_evicts_least_recently_used_entries():
+    cache = caching.LRUCache(max_entries=2)
+
+    cache.set("a", b"a", ttl=60)
+    cache.set("b", b"b", ttl=60)
+    assert cache.get("a") == b"a"
+    cache.set("c", b"c", ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"a"
+    assert cache.get("c") == b"c"
+    assert cache.stats.evictions == 1
+
+
+def test_lru_cache_bounds_total_bytes():
+    cache = caching.LRUCache(max_bytes=10)
+
+    cache.set("a", b"12345", ttl=60)
+    cache.set("b", b"12345", ttl=60)
+    cache.set("c", b"12345", ttl=60)
+    cache.set("too large", b"12345678901", ttl=60)
+
+    assert list(cache.entries) == ["b", "c"]
+    assert cache.size == 10
+
+
+def test_lru_cache_invalidate():
+    cache = caching.LRUCache()
+
+    cache.set(("foo", "1"), b"1", ttl=60)
+    cache.set(("foo", "2"), b"2", ttl=60)
+    cache.set(("bar", "1"), b"3", ttl=60)
+
+    assert cache.invalidate(lambda key: key[0] == "foo") == 2
+    assert list(cache.entries) == [("bar", "1")]
+    assert cache.invalidate() == 1
+    assert cache.size == 0
+
+
+@pytest.mark.asyncio
+async def test_prefetch_cache_returns_ready_results():
+    cache = caching.PrefetchCache()
+
+    async def fetch():
+        return "remote"
+
+    async def fail():
+        raise ValueError("unavailable")
+
+    await cache.start("a", fetch, ttl=10)
+    await cache.start("b", fail, ttl=10)
+
+    assert await cache.pop("a") == "remote"
+    assert await cache.pop("a") is None
+    assert await cache.pop("b") is None
+    assert cache.stats == caching.CacheStats(hits=2, misses=1)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_cache_waits_for_running_calls():
+    cache = caching.PrefetchCache()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "remote"
+
+    cache.start("a", fetch, ttl=10)
+    pop = asyncio.ensure_future(cache.pop("a"))
+    await asyncio.sleep(0)
+    assert not pop.done()
+
+    release.set()
+    assert await pop == "remote"
+
+    # Up to the timeout
+    release.clear()
+    running = cache.start("b", fetch, ttl=10)
+    assert await cache.pop("b", timeout=0.01) is None
+    await asyncio.sleep(0)
+    assert running.cancelled()
+    assert cache.stats == caching.CacheStats(hits=1, misses=1)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_cache_cancels_evicted_and_expired_calls():
+    clock = FakeClock()
+    cache = caching.PrefetchCache(max_entries=2, clock=clock)
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    evicted = cache.start("evicted", slow, ttl=10)
+    expired = cache.start("expired", slow, ttl=10)
+    kept = cache.start("kept", slow, ttl=10)
+    await asyncio.sleep(0)
+    assert evicted.cancelled()
+    assert len(cache) == 2
+
+    clock.now = 10
+    assert await cache.pop("expired") is None
+    await asyncio.sleep(0)
+    assert expired.cancelled()
+
+    cache.clear()
+    await asyncio.sleep(0)
+    assert kept.cancelled()
+    assert cache.stats == caching.CacheStats(misses=1, evictions=1, expirations=1)
+
+
+@pytest.mark.asyncio
+async def test_persistent_cache_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+
+    cache = caching.PersistentCache(path)
+    await cache.set("key", b"value", ttl=60)
+    await cache.set("expired", b"value", ttl=-1)
+    await cache.close()
+
+    cache = caching.PersistentCache(path)
+    assert await cache.get("key") == b"value"
+    assert await cache.get("expired") is None
+    assert cache.stats == caching.CacheStats(hits=1, misses=1, expirations=1)
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_persistent_cache_compacts_to_max_bytes(tmp_path):
+    clock = FakeClock()
+    cache = caching.PersistentCache(
+        str(tmp_path / "cache.sqlite"), max_bytes=10, clock=clock
+    )
+
+    for key in ("a", "b", "c"):
+        clock.now += 1
+        await cache.set(key, b"12345", ttl=60)
+
+    assert await cache.get("a") is None
+    assert await cache.get("b") == b"12345"
+    assert await cache.get("c") == b"12345"
+    assert cache.stats.evictions == 1
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_persistent_cache_invalidate_prefix(tmp_path):
+    cache = caching.PersistentCache(str(tmp_path / "cache.sqlite"))
+    for key in ("foo:1", "foo:2", "foobar:1"):
+        await cache.set(key, b"value", ttl=60)
+
+    assert await cache.invalidate_prefix("foo:") == 2
+    assert await cache.get("foo:1") is None
+    assert await cache.get("foobar:1") == b"value"
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_fills_once_across_instances(tmp_path):
+    # Each instance stands in for a separate plugin process
+    caches = [caching.SharedCache(str(tmp_path)) for _ in range(3)]
+    fills = 0
+
+    async def fill():
+        nonlocal fills
+        fills += 1
+        await asyncio.sleep(0.05)
+        return b"value"
+
+    values = await asyncio.gather(
+        *(cache.get_or_fill("key", fill, ttl=60) for cache in caches)
+    )
+    assert values == [b"value"] * 3
+    assert fills == 1
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_does_not_store_failed_fills(tmp_path):
+    cache = caching.SharedCache(str(tmp_path))
+
+    async def fail():
+        return None
+
+    async def fill():
+        return b"value"
+
+    assert await cache.get_or_fill("key", fail, ttl=60) is None
+    assert await cache.get_or_fill("key", fill, ttl=60) == b"value"
+    assert await cache.get("key") == b"value"
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_prunes_expired_values(tmp_path):
+    clock = FakeClock()
+    cache = caching.SharedCache(str(tmp_path), clock=clock)
+    await cache.set("expired", b"value", ttl=1)
+    await cache.set("fresh", b"value", ttl=60)
+
+    clock.now = 10
+    assert await cache.get("expired") is None
+
+    cache = caching.SharedCache(str(tmp_path), clock=clock)
+    assert cache.stats.expirations == 1
+    assert await cache.get("fresh") == b"value"
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_invalidate_prefix(tmp_path):
+    cache = caching.SharedCache(str(tmp_path))
+    for key in ("foo:1", "foo:2", "foobar:1"):
+        await cache.set(key, b"value", ttl=60)
+
+    assert await cache.invalidate_prefix("foo:") == 2
+    assert await cache.get("foo:1") is None
+    assert await cache.get("foobar:1") == b"value"
+
+    async def fill():
+        return b"refilled"
+
+    assert await cache.get_or_fill("foo:2", fill, ttl=60) == b"refilled"
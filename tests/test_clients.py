@@ -0,0 +1,44 @@
+import pytest
+
+from terraform import clients
+
+httpx = pytest.importorskip("httpx")
+
+
+@pytest.mark.asyncio
+async def test_client_registry_http_client_is_shared():
+    async def handler(request):
+        assert registry.stats["default"].requests_in_flight == 1
+        return httpx.Response(200, text="ok")
+
+    registry = clients.ClientRegistry(limits=clients.PoolLimits(max_connections=4))
+    client = registry.http(transport=httpx.MockTransport(handler))
+    assert registry.http() is client
+
+    response = await client.get("https://example.com")
+    assert response.text == "ok"
+
+    stats = registry.stats["default"]
+    assert stats.requests_total == 1
+    assert stats.requests_in_flight == 0
+    assert stats.peak_utilization == 0.25
+
+    await registry.close()
+    assert client.is_closed
+    assert "default" not in registry
+
+
+@pytest.mark.asyncio
+async def test_client_registry_closes_added_clients():
+    class Client:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    registry = clients.ClientRegistry()
+    client = registry.add("custom", Client())
+    assert registry["custom"] is client
+
+    await registry.close()
+    assert client.closed
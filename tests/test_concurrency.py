@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from terraform import concurrency, ratelimit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_latency_window_percentiles():
+    window = concurrency.LatencyWindow(100)
+    assert window.percentile(50) is None
+
+    for latency in range(1, 101):
+        window.add(latency)
+    assert window.percentile(50) == 51
+    assert window.percentile(99) == 100
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_bounds_concurrency():
+    limiter = concurrency.AdaptiveLimiter(
+        concurrency.AdaptiveLimits(initial_limit=2, max_limit=2)
+    )
+    running = peak = 0
+
+    async def call():
+        nonlocal running, peak
+        async with limiter.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call() for _ in range(6)))
+    assert peak == 2
+    assert limiter.stats().in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_increases_when_saturated():
+    limiter = concurrency.AdaptiveLimiter(
+        concurrency.AdaptiveLimits(initial_limit=1, max_limit=3)
+    )
+
+    async def call():
+        async with limiter.slot():
+            await asyncio.sleep(0)
+
+    await call()
+    assert limiter.stats().limit == 2
+
+    # The limit only grows while calls use all of it
+    await call()
+    assert limiter.stats().limit == 2
+
+    await asyncio.gather(*(call() for _ in range(6)))
+    assert limiter.stats().limit == 3
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_decreases_when_throttled():
+    clock = FakeClock()
+    limiter = concurrency.AdaptiveLimiter(
+        concurrency.AdaptiveLimits(initial_limit=8), clock=clock
+    )
+
+    with pytest.raises(ratelimit.RateLimitedError):
+        async with limiter.slot():
+            raise ratelimit.RateLimitedError
+
+    assert limiter.stats().limit == 4
+
+
+def test_adaptive_limiter_decreases_on_latency_spikes():
+    clock = FakeClock()
+    limiter = concurrency.AdaptiveLimiter(
+        concurrency.AdaptiveLimits(initial_limit=8), clock=clock
+    )
+
+    for _ in range(10):
+        limiter.update(1.0, throttled=False, saturated=False)
+    assert limiter.stats().limit == 8
+
+    clock.now = 10
+    limiter.update(5.0, throttled=False, saturated=False)
+    assert limiter.stats().limit == 4
+
+    # Spikes of calls that were already running do not back off again
+    limiter.update(5.0, throttled=False, saturated=False)
+    assert limiter.stats().limit == 4
+
+    stats = limiter.stats()
+    assert stats.latency_p50 == 1.0
+    assert stats.latency_p99 == 5.0
+
+
+def test_adaptive_limiter_compares_latencies_per_key():
+    clock = FakeClock()
+    limiter = concurrency.AdaptiveLimiter(
+        concurrency.AdaptiveLimits(initial_limit=8), clock=clock
+    )
+
+    for _ in range(50):
+        limiter.update(0.01, throttled=False, saturated=False, key="read")
+    # Slower operations are not spikes of faster ones
+    for _ in range(10):
+        clock.now += 1
+        limiter.update(1.0, throttled=False, saturated=False, key="create")
+    assert limiter.stats().limit == 8
+
+    clock.now += 1
+    limiter.update(5.0, throttled=False, saturated=False, key="create")
+    assert limiter.stats().limit == 4
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Microseconds, about twice the import time on a developer machine, so that only
+# regressions such as a heavy module imported eagerly go over it
+IMPORT_TIME_BUDGET = 1_000_000
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def import_time(module: str) -> int:
+    """Return the cumulative import time of ``module``, in microseconds."""
+    stderr = run_python("-X", "importtime", "-c", f"import {module}").stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    raise AssertionError(f"{module} was not imported")
+
+
+def test_plugin_import_time():
+    # The fastest of a few runs, as the first one may compile bytecode
+    assert min(import_time("terraform.plugin") for _ in range(3)) < IMPORT_TIME_BUDGET
+
+
+@pytest.mark.parametrize("module", ["cryptography", "httpx", "sqlite3"])
+def test_plugin_import_is_lazy(module):
+    stdout = run_python(
+        "-c", "import sys, terraform.plugin; print(' '.join(sys.modules))"
+    ).stdout
+    assert module not in stdout.split()
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from terraform import pagination
+
+
+async def numbered_pages(count, fetched, *, size=2, fail_at=None):
+    for number in range(count):
+        if number == fail_at:
+            raise RuntimeError("page failed")
+        await asyncio.sleep(0)
+        fetched.append(number)
+        yield [number * size + offset for offset in range(size)]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_fetches_ahead():
+    fetched = []
+    pages = pagination.prefetch(numbered_pages(5, fetched), lookahead=2)
+
+    assert await pages.__anext__() == [0, 1]
+    await asyncio.sleep(0.01)
+    # The page being processed, plus up to two queued and one pending put
+    assert fetched == [0, 1, 2, 3]
+
+    assert [page async for page in pages] == [[2, 3], [4, 5], [6, 7], [8, 9]]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_without_lookahead():
+    fetched = []
+    pages = pagination.prefetch(numbered_pages(3, fetched), lookahead=0)
+
+    assert await pages.__anext__() == [0, 1]
+    await asyncio.sleep(0.01)
+    assert fetched == [0]
+    await pages.aclose()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_raises_page_errors():
+    fetched = []
+    pages = pagination.prefetch(numbered_pages(3, fetched, fail_at=1))
+
+    with pytest.raises(RuntimeError, match="page failed"):
+        async for _ in pages:
+            pass
+
+
+@pytest.mark.asyncio
+async def test_collect_applies_limit_and_predicate():
+    fetched = []
+    items = await pagination.collect(
+        numbered_pages(10, fetched), limit=3, predicate=lambda item: item % 2 == 0
+    )
+
+    assert items == [0, 2, 4]
+    assert fetched == [0, 1, 2]
+    assert await pagination.collect(numbered_pages(10, fetched), limit=0) == []
+
+
+@pytest.mark.asyncio
+async def test_collect_stops_prefetching_at_limit():
+    fetched = []
+    pages = pagination.prefetch(numbered_pages(100, fetched), lookahead=1)
+    try:
+        assert await pagination.collect(pages, limit=3) == [0, 1, 2]
+    finally:
+        await pages.aclose()
+
+    await asyncio.sleep(0.01)
+    assert len(fetched) < 5
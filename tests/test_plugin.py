@@ -1,9 +1,32 @@
+import asyncio
+import io
+import json
+import os
+import socket
+import ssl
+import stat
+import sys
+import time
 import typing
 
+import grpclib.client
+import grpclib.const
+import grpclib.exceptions
+import grpclib.server
 import pytest
 from grpclib.testing import ChannelFor
 
-from terraform import fields, plugin, schemas, utils
+from terraform import (
+    caching,
+    concurrency,
+    context,
+    fields,
+    plugin,
+    ratelimit,
+    schemas,
+    unknowns,
+    utils,
+)
 from terraform.protos import tfplugin5_1_grpc, tfplugin5_1_pb2
 
 
@@ -95,3 +118,1326 @@ async def test_prepare_provider_config(
             utils.from_dynamic_value_proto(response.prepared_config)
             == expected_output_config
         )
+
+
+class BatchReadResource(schemas.Resource):
+    name = "batch"
+    batch_max_size = 3
+
+    value = fields.String(optional=True, computed=True)
+
+    def __init__(self):
+        super().__init__()
+        self.batches: typing.List[typing.List[str]] = []
+
+    async def batch_read(self, items):
+        self.batches.append(sorted(item["id"] for item in items))
+        errors = []
+        for item in items:
+            if item["id"] == "gone":
+                item.set_id("")
+            item["value"] = f"read {item['id']}"
+            errors.append(ValueError("broken") if item["id"] == "broken" else None)
+        return errors
+
+
+@pytest.mark.asyncio
+async def test_read_resource_batch_read():
+    resource = BatchReadResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        responses = await asyncio.gather(
+            *(
+                stub.ReadResource(
+                    tfplugin5_1_pb2.ReadResource.Request(
+                        type_name="batch",
+                        current_state=utils.to_dynamic_value_proto({"id": id}),
+                    )
+                )
+                for id in ("a", "gone", "broken")
+            )
+        )
+
+    assert resource.batches == [["a", "broken", "gone"]]
+    assert utils.from_dynamic_value_proto(responses[0].new_state) == {
+        "id": "a",
+        "value": "read a",
+    }
+    assert utils.from_dynamic_value_proto(responses[1].new_state) is None
+    assert utils.from_dynamic_value_proto(responses[2].new_state) == {"id": "broken"}
+    assert [d.summary for d in responses[2].diagnostics] == ["broken"]
+
+
+class BatchMutateResource(schemas.Resource):
+    name = "batch"
+
+    value = fields.String(optional=True)
+
+    def __init__(self):
+        super().__init__()
+        self.created: typing.List[typing.List[str]] = []
+        self.deleted: typing.List[typing.List[str]] = []
+
+    async def batch_create(self, items):
+        self.created.append(sorted(item["value"] for item in items))
+        for item in items:
+            item.set_id(f"id-{item['value']}")
+
+    async def batch_delete(self, items):
+        self.deleted.append(sorted(item["id"] for item in items))
+        return [ValueError("in use") if item["id"] == "b" else None for item in items]
+
+
+@pytest.mark.asyncio
+async def test_apply_resource_change_batch_create_and_delete():
+    resource = BatchMutateResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        created = await asyncio.gather(
+            *(
+                stub.ApplyResourceChange(
+                    tfplugin5_1_pb2.ApplyResourceChange.Request(
+                        type_name="batch",
+                        prior_state=utils.to_dynamic_value_proto(None),
+                        planned_state=utils.to_dynamic_value_proto({"value": value}),
+                        config=utils.to_dynamic_value_proto({"value": value}),
+                    )
+                )
+                for value in ("x", "y")
+            )
+        )
+        deleted = await asyncio.gather(
+            *(
+                stub.ApplyResourceChange(
+                    tfplugin5_1_pb2.ApplyResourceChange.Request(
+                        type_name="batch",
+                        prior_state=utils.to_dynamic_value_proto({"id": id}),
+                        planned_state=utils.to_dynamic_value_proto(None),
+                        config=utils.to_dynamic_value_proto(None),
+                    )
+                )
+                for id in ("a", "b")
+            )
+        )
+
+    assert resource.created == [["x", "y"]]
+    assert [utils.from_dynamic_value_proto(r.new_state) for r in created] == [
+        {"id": "id-x", "value": "x"},
+        {"id": "id-y", "value": "y"},
+    ]
+
+    assert resource.deleted == [["a", "b"]]
+    assert utils.from_dynamic_value_proto(deleted[0].new_state) is None
+    assert utils.from_dynamic_value_proto(deleted[1].new_state) == {"id": "b"}
+    assert [d.summary for d in deleted[1].diagnostics] == ["in use"]
+
+
+class CountingDataSource(schemas.Resource):
+    name = "counting"
+
+    value = fields.String(optional=True)
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def read(self, data):
+        self.reads += 1
+        await asyncio.sleep(0.01)
+        data.set_id(f"read-{data['value']}")
+
+
+@pytest.mark.asyncio
+async def test_read_data_source_deduplicates_concurrent_reads():
+    data_source = CountingDataSource()
+    provider = schemas.Provider(data_sources=[data_source])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        responses = await asyncio.gather(
+            *(
+                stub.ReadDataSource(
+                    tfplugin5_1_pb2.ReadDataSource.Request(
+                        type_name="counting",
+                        config=utils.to_dynamic_value_proto({"value": value}),
+                    )
+                )
+                for value in ("a", "a", "b")
+            )
+        )
+
+    assert data_source.reads == 2
+    assert [utils.from_dynamic_value_proto(r.state) for r in responses] == [
+        {"id": "read-a", "value": "a"},
+        {"id": "read-a", "value": "a"},
+        {"id": "read-b", "value": "b"},
+    ]
+
+
+class CachedDataSource(CountingDataSource):
+    name = "cached"
+    cache_ttl = 60
+
+
+@pytest.mark.asyncio
+async def test_read_data_source_cache():
+    data_source = CachedDataSource()
+    provider = schemas.Provider(data_sources=[data_source])
+    service = plugin.ProviderService(provider=provider)
+    request = tfplugin5_1_pb2.ReadDataSource.Request(
+        type_name="cached", config=utils.to_dynamic_value_proto({"value": "a"})
+    )
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        first = await stub.ReadDataSource(request)
+        second = await stub.ReadDataSource(request)
+        assert data_source.reads == 1
+        assert second.state == first.state
+
+        await data_source.invalidate_cache()
+        await stub.ReadDataSource(request)
+        assert data_source.reads == 2
+
+    assert provider.data_source_cache.stats == caching.CacheStats(hits=1, misses=2)
+
+
+@pytest.mark.asyncio
+async def test_read_data_source_persistent_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    request = tfplugin5_1_pb2.ReadDataSource.Request(
+        type_name="cached", config=utils.to_dynamic_value_proto({"value": "a"})
+    )
+
+    responses = []
+    for _ in range(2):
+        # Each provider instance stands in for a new plugin process
+        data_source = CachedDataSource()
+        provider = schemas.Provider(data_sources=[data_source])
+        provider.persistent_cache = caching.PersistentCache(path)
+        service = plugin.ProviderService(provider=provider)
+
+        async with ChannelFor([service]) as channel:
+            stub = tfplugin5_1_grpc.ProviderStub(channel)
+            responses.append(await stub.ReadDataSource(request))
+
+        await provider.persistent_cache.close()
+
+    assert data_source.reads == 0
+    assert responses[0].state == responses[1].state
+
+
+@pytest.mark.asyncio
+async def test_invalidate_cache_clears_persistent_cache(tmp_path):
+    data_source = CachedDataSource()
+    provider = schemas.Provider(data_sources=[data_source])
+    provider.persistent_cache = caching.PersistentCache(str(tmp_path / "cache.sqlite"))
+    service = plugin.ProviderService(provider=provider)
+    request = tfplugin5_1_pb2.ReadDataSource.Request(
+        type_name="cached", config=utils.to_dynamic_value_proto({"value": "a"})
+    )
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        await stub.ReadDataSource(request)
+        await data_source.invalidate_cache()
+        await stub.ReadDataSource(request)
+
+    await provider.persistent_cache.close()
+    assert data_source.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_read_data_source_shared_cache(tmp_path):
+    request = tfplugin5_1_pb2.ReadDataSource.Request(
+        type_name="cached", config=utils.to_dynamic_value_proto({"value": "a"})
+    )
+
+    # Each provider instance stands in for a concurrent plugin process
+    data_sources = [CachedDataSource() for _ in range(2)]
+    services = []
+    for data_source in data_sources:
+        provider = schemas.Provider(data_sources=[data_source])
+        provider.shared_cache = caching.SharedCache(str(tmp_path))
+        services.append(plugin.ProviderService(provider=provider))
+
+    async with ChannelFor([services[0]]) as first, ChannelFor([services[1]]) as second:
+        responses = await asyncio.gather(
+            tfplugin5_1_grpc.ProviderStub(first).ReadDataSource(request),
+            tfplugin5_1_grpc.ProviderStub(second).ReadDataSource(request),
+        )
+
+    assert sum(data_source.reads for data_source in data_sources) == 1
+    assert responses[0].state == responses[1].state
+
+
+@pytest.mark.asyncio
+async def test_invalidate_cache_clears_shared_cache(tmp_path):
+    data_source = CachedDataSource()
+    provider = schemas.Provider(data_sources=[data_source])
+    provider.shared_cache = caching.SharedCache(str(tmp_path))
+    service = plugin.ProviderService(provider=provider)
+    request = tfplugin5_1_pb2.ReadDataSource.Request(
+        type_name="cached", config=utils.to_dynamic_value_proto({"value": "a"})
+    )
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        await stub.ReadDataSource(request)
+        await data_source.invalidate_cache()
+        await stub.ReadDataSource(request)
+
+    assert data_source.reads == 2
+
+
+class PagedDataSource(schemas.Resource):
+    name = "paged"
+    page_attribute = "names"
+    page_limit = 3
+
+    prefix = fields.String(optional=True)
+    names = fields.List(fields.String(), computed=True)
+
+    def __init__(self):
+        super().__init__()
+        self.pages = 0
+
+    async def read_pages(self, data):
+        data.set_id(data["prefix"])
+        for number in range(10):
+            self.pages += 1
+            yield [f"a{number}", f"b{number}"]
+
+    def filter_item(self, data, item):
+        return item.startswith(data["prefix"])
+
+
+@pytest.mark.asyncio
+async def test_read_data_source_pages():
+    data_source = PagedDataSource()
+    provider = schemas.Provider(data_sources=[data_source])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+        response = await stub.ReadDataSource(
+            tfplugin5_1_pb2.ReadDataSource.Request(
+                type_name="paged", config=utils.to_dynamic_value_proto({"prefix": "b"})
+            )
+        )
+
+    assert not response.diagnostics
+    assert utils.from_dynamic_value_proto(response.state) == {
+        "id": "b",
+        "prefix": "b",
+        "names": ["b0", "b1", "b2"],
+    }
+    # Stops after the limit, save for the page fetched ahead
+    assert data_source.pages <= 4
+
+
+@pytest.mark.asyncio
+async def test_stop_closes_clients():
+    provider = schemas.Provider()
+    service = plugin.ProviderService(provider=provider)
+
+    class Client:
+        closed = False
+
+        async def aclose(self):
+            self.closed = True
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        await stub.Configure(
+            tfplugin5_1_pb2.Configure.Request(config=utils.to_dynamic_value_proto({}))
+        )
+        client = provider.clients.add("custom", Client())
+
+        await stub.Stop(tfplugin5_1_pb2.Stop.Request())
+        assert client.closed
+
+
+class SlowResource(schemas.Resource):
+    name = "slow"
+
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.cleaned_up = False
+
+    async def create(self, data):
+        self.started.set()
+        try:
+            await context.current().wait_stopped()
+            await asyncio.sleep(60)
+        finally:
+            self.cleaned_up = True
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_running_operations():
+    resource = SlowResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        apply = asyncio.ensure_future(
+            stub.ApplyResourceChange(
+                tfplugin5_1_pb2.ApplyResourceChange.Request(
+                    type_name="slow",
+                    prior_state=utils.to_dynamic_value_proto(None),
+                    planned_state=utils.to_dynamic_value_proto({}),
+                    config=utils.to_dynamic_value_proto({}),
+                )
+            )
+        )
+        await resource.started.wait()
+
+        stop_response = await stub.Stop(tfplugin5_1_pb2.Stop.Request())
+        assert stop_response.Error == ""
+        assert resource.cleaned_up
+        assert not service.tasks
+
+        apply_response = await apply
+        assert [d.summary for d in apply_response.diagnostics] == [
+            "Operation was stopped"
+        ]
+
+
+@pytest.mark.asyncio
+async def test_configure_resets_stopped_run():
+    resource = BatchMutateResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        await stub.Configure(
+            tfplugin5_1_pb2.Configure.Request(config=utils.to_dynamic_value_proto({}))
+        )
+        await stub.Stop(tfplugin5_1_pb2.Stop.Request())
+
+        # The next run of a reattached plugin
+        await stub.Configure(
+            tfplugin5_1_pb2.Configure.Request(config=utils.to_dynamic_value_proto({}))
+        )
+        response = await stub.ApplyResourceChange(
+            tfplugin5_1_pb2.ApplyResourceChange.Request(
+                type_name="batch",
+                prior_state=utils.to_dynamic_value_proto(None),
+                planned_state=utils.to_dynamic_value_proto({"value": "x"}),
+                config=utils.to_dynamic_value_proto({"value": "x"}),
+            )
+        )
+
+    assert not response.diagnostics
+    assert utils.from_dynamic_value_proto(response.new_state) == {
+        "id": "id-x",
+        "value": "x",
+    }
+
+
+class StubbornResource(SlowResource):
+    name = "stubborn"
+
+    async def create(self, data):
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            await asyncio.sleep(60)
+
+
+@pytest.mark.asyncio
+async def test_stop_grace_period():
+    resource = StubbornResource()
+    provider = schemas.Provider(resources=[resource])
+    provider.stop_grace_period = 0.01
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        apply = asyncio.ensure_future(
+            stub.ApplyResourceChange(
+                tfplugin5_1_pb2.ApplyResourceChange.Request(
+                    type_name="stubborn",
+                    prior_state=utils.to_dynamic_value_proto(None),
+                    planned_state=utils.to_dynamic_value_proto({}),
+                    config=utils.to_dynamic_value_proto({}),
+                )
+            )
+        )
+        await resource.started.wait()
+
+        stop_response = await stub.Stop(tfplugin5_1_pb2.Stop.Request())
+        assert stop_response.Error == "1 operations did not stop within 0.01 seconds"
+
+        for task in service.tasks:
+            task.cancel()
+        await apply
+
+
+class TimeoutResource(schemas.Resource):
+    name = "timeout"
+    timeouts = schemas.Timeouts(create=60)
+
+    async def create(self, data):
+        assert context.current().time_remaining() <= 0.05
+        await asyncio.sleep(60)
+
+
+@pytest.mark.asyncio
+async def test_apply_resource_change_timeout():
+    provider = schemas.Provider(resources=[TimeoutResource()])
+    service = plugin.ProviderService(provider=provider)
+    config = {"timeouts": {"create": "50ms"}}
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        response = await stub.ApplyResourceChange(
+            tfplugin5_1_pb2.ApplyResourceChange.Request(
+                type_name="timeout",
+                prior_state=utils.to_dynamic_value_proto(None),
+                planned_state=utils.to_dynamic_value_proto(config),
+                config=utils.to_dynamic_value_proto(config),
+            )
+        )
+
+    assert [d.summary for d in response.diagnostics] == [
+        "timeout create did not complete before its deadline"
+    ]
+    assert not service.tasks
+
+
+@pytest.mark.asyncio
+async def test_validate_resource_type_config_timeouts():
+    provider = schemas.Provider(resources=[TimeoutResource()])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        response = await stub.ValidateResourceTypeConfig(
+            tfplugin5_1_pb2.ValidateResourceTypeConfig.Request(
+                type_name="timeout",
+                config=utils.to_dynamic_value_proto({"timeouts": {"create": "soon"}}),
+            )
+        )
+
+    assert [d.summary for d in response.diagnostics] == ["Invalid duration: 'soon'"]
+    assert [s.attribute_name for s in response.diagnostics[0].attribute.steps] == [
+        "timeouts",
+        "create",
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "timeouts",
+    [
+        pytest.param({"create": unknowns.UNKNOWN}, id="unknown value"),
+        pytest.param(unknowns.UNKNOWN, id="unknown block"),
+    ],
+)
+async def test_validate_resource_type_config_unknown_timeouts(timeouts):
+    provider = schemas.Provider(resources=[TimeoutResource()])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        response = await stub.ValidateResourceTypeConfig(
+            tfplugin5_1_pb2.ValidateResourceTypeConfig.Request(
+                type_name="timeout",
+                config=utils.to_dynamic_value_proto({"timeouts": timeouts}),
+            )
+        )
+
+    assert not response.diagnostics
+
+
+class QuickTimeoutResource(schemas.Resource):
+    name = "quick_timeout"
+    timeouts = schemas.Timeouts(create=60)
+
+    async def create(self, data):
+        data.set_id("quick")
+
+
+@pytest.mark.asyncio
+async def test_plan_and_apply_without_timeouts_block():
+    provider = schemas.Provider(resources=[QuickTimeoutResource()])
+    service = plugin.ProviderService(provider=provider)
+    config = {"id": None, "timeouts": None}
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        planned = await stub.PlanResourceChange(
+            tfplugin5_1_pb2.PlanResourceChange.Request(
+                type_name="quick_timeout",
+                prior_state=utils.to_dynamic_value_proto(None),
+                proposed_new_state=utils.to_dynamic_value_proto(config),
+                config=utils.to_dynamic_value_proto(config),
+            )
+        )
+        assert utils.from_dynamic_value_proto(planned.planned_state) == {
+            "id": unknowns.UNKNOWN,
+            "timeouts": None,
+        }
+
+        applied = await stub.ApplyResourceChange(
+            tfplugin5_1_pb2.ApplyResourceChange.Request(
+                type_name="quick_timeout",
+                prior_state=utils.to_dynamic_value_proto(None),
+                planned_state=planned.planned_state,
+                config=utils.to_dynamic_value_proto(config),
+                planned_private=planned.planned_private,
+            )
+        )
+
+    assert not applied.diagnostics
+    assert utils.from_dynamic_value_proto(applied.new_state) == {
+        "id": "quick",
+        "timeouts": None,
+    }
+
+
+class ComputedResource(schemas.Resource):
+    name = "computed"
+
+    value = fields.String(optional=True)
+    address = fields.String(computed=True)
+
+    async def create(self, data):
+        if data["value"] == "fail":
+            raise ValueError("quota exceeded")
+        data.set_id("computed")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "value,expected_state,expected_summaries",
+    [
+        ("ok", {"id": "computed", "value": "ok", "address": None}, []),
+        ("fail", None, ["quota exceeded"]),
+    ],
+)
+async def test_apply_resource_change_returns_no_unknowns(
+    value, expected_state, expected_summaries
+):
+    provider = schemas.Provider(resources=[ComputedResource()])
+    service = plugin.ProviderService(provider=provider)
+    config = {"id": None, "value": value, "address": None}
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        planned = await stub.PlanResourceChange(
+            tfplugin5_1_pb2.PlanResourceChange.Request(
+                type_name="computed",
+                prior_state=utils.to_dynamic_value_proto(None),
+                proposed_new_state=utils.to_dynamic_value_proto(config),
+                config=utils.to_dynamic_value_proto(config),
+            )
+        )
+        applied = await stub.ApplyResourceChange(
+            tfplugin5_1_pb2.ApplyResourceChange.Request(
+                type_name="computed",
+                prior_state=utils.to_dynamic_value_proto(None),
+                planned_state=planned.planned_state,
+                config=utils.to_dynamic_value_proto(config),
+                planned_private=planned.planned_private,
+            )
+        )
+
+    assert utils.from_dynamic_value_proto(applied.new_state) == expected_state
+    assert [d.summary for d in applied.diagnostics] == expected_summaries
+
+
+class FailingUpdateResource(schemas.Resource):
+    name = "failing_update"
+
+    value = fields.String(optional=True)
+    address = fields.String(optional=True)
+
+    async def update(self, data):
+        if data["value"] == "partial":
+            data["address"] = "applied"
+            data.partial = True
+        raise ValueError("quota exceeded")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "value,expected_state",
+    [
+        pytest.param(
+            "new",
+            {"id": "failing", "value": "old", "address": "old"},
+            id="prior state",
+        ),
+        pytest.param(
+            "partial",
+            {"id": "failing", "value": "partial", "address": "applied"},
+            id="partial state",
+        ),
+    ],
+)
+async def test_apply_resource_change_failed_update(value, expected_state):
+    provider = schemas.Provider(resources=[FailingUpdateResource()])
+    service = plugin.ProviderService(provider=provider)
+    prior_state = {"id": "failing", "value": "old", "address": "old"}
+    planned_state = {"id": "failing", "value": value, "address": "new"}
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        applied = await stub.ApplyResourceChange(
+            tfplugin5_1_pb2.ApplyResourceChange.Request(
+                type_name="failing_update",
+                prior_state=utils.to_dynamic_value_proto(prior_state),
+                planned_state=utils.to_dynamic_value_proto(planned_state),
+                config=utils.to_dynamic_value_proto(planned_state),
+            )
+        )
+
+    assert utils.from_dynamic_value_proto(applied.new_state) == expected_state
+    assert [d.summary for d in applied.diagnostics] == ["quota exceeded"]
+
+
+class VersionedResource(schemas.Resource):
+    name = "versioned"
+
+    value = fields.String(optional=True)
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def read_if_changed(self, data):
+        return data.version_token != "v1"
+
+    async def read(self, data):
+        self.reads += 1
+        data["value"] = "remote"
+        data.set_version_token("v2")
+
+
+@pytest.mark.asyncio
+async def test_read_resource_read_if_changed():
+    resource = VersionedResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    def request(version_token):
+        return tfplugin5_1_pb2.ReadResource.Request(
+            type_name="versioned",
+            current_state=utils.to_dynamic_value_proto({"id": "a", "value": "local"}),
+            private=json.dumps({"version_token": version_token}).encode("ascii"),
+        )
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        unchanged_request = request("v1")
+        unchanged = await stub.ReadResource(unchanged_request)
+        assert resource.reads == 0
+        assert unchanged.new_state == unchanged_request.current_state
+        assert unchanged.private == unchanged_request.private
+
+        changed = await stub.ReadResource(request("v0"))
+        assert resource.reads == 1
+        assert utils.from_dynamic_value_proto(changed.new_state) == {
+            "id": "a",
+            "value": "remote",
+        }
+        assert json.loads(changed.private) == {"version_token": "v2"}
+
+
+class ImportableResource(BatchReadResource):
+    name = "importable"
+    batch_max_size = 100
+
+    async def import_state(self, id):
+        return [schemas.ResourceData({"id": f"{id}-{i}"}) for i in range(3)] + [
+            schemas.ResourceData({"id": "gone"})
+        ]
+
+
+@pytest.mark.asyncio
+async def test_import_resource_state():
+    resource = ImportableResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        response = await stub.ImportResourceState(
+            tfplugin5_1_pb2.ImportResourceState.Request(type_name="importable", id="x")
+        )
+
+    assert resource.batches == [["gone", "x-0", "x-1", "x-2"]]
+    assert [r.type_name for r in response.imported_resources] == ["importable"] * 3
+    assert [
+        utils.from_dynamic_value_proto(r.state) for r in response.imported_resources
+    ] == [{"id": f"x-{i}", "value": f"read x-{i}"} for i in range(3)]
+    assert [d.summary for d in response.diagnostics] == [
+        "Cannot import non-existent remote object"
+    ]
+
+
+class BusyResource(schemas.Resource):
+    name = "busy"
+
+    value = fields.String(optional=True)
+
+    def __init__(self):
+        super().__init__()
+        self.calls: typing.List[str] = []
+        self.release = asyncio.Event()
+
+    async def create(self, data):
+        self.calls.append(f"create {data['value']}")
+        await self.release.wait()
+        data.set_id(data["value"])
+
+    async def read(self, data):
+        self.calls.append(f"read {data['id']}")
+
+
+@pytest.mark.asyncio
+async def test_reads_are_scheduled_before_mutations():
+    resource = BusyResource()
+    provider = schemas.Provider(resources=[resource])
+    provider.concurrency_limits = concurrency.AdaptiveLimits(
+        initial_limit=1, max_limit=1
+    )
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        def create(value):
+            return asyncio.ensure_future(
+                stub.ApplyResourceChange(
+                    tfplugin5_1_pb2.ApplyResourceChange.Request(
+                        type_name="busy",
+                        prior_state=utils.to_dynamic_value_proto(None),
+                        planned_state=utils.to_dynamic_value_proto({"value": value}),
+                        config=utils.to_dynamic_value_proto({"value": value}),
+                    )
+                )
+            )
+
+        first = create("a")
+        while not resource.calls:
+            await asyncio.sleep(0.001)
+        second = create("b")
+        await asyncio.sleep(0.01)
+        read = asyncio.ensure_future(
+            stub.ReadResource(
+                tfplugin5_1_pb2.ReadResource.Request(
+                    type_name="busy",
+                    current_state=utils.to_dynamic_value_proto({"id": "a"}),
+                )
+            )
+        )
+        await asyncio.sleep(0.01)
+
+        stats = service.scheduler_stats()
+        assert stats["read"].queued == 1
+        assert stats["mutation"].queued == 1
+
+        resource.release.set()
+        await asyncio.gather(first, second, read)
+
+    assert resource.calls == ["create a", "read a", "create b"]
+    assert service.scheduler_stats()["mutation"].admitted == 2
+
+
+class ThrottledResource(schemas.Resource):
+    name = "throttled"
+    rate_limit_scope = "api"
+
+    def __init__(self):
+        super().__init__()
+        self.started: typing.List[float] = []
+        self.release = asyncio.Event()
+
+    async def read(self, data):
+        self.started.append(time.monotonic())
+        await self.release.wait()
+
+
+@pytest.mark.asyncio
+async def test_hooks_released_by_concurrency_limit_keep_rate():
+    resource = ThrottledResource()
+    provider = schemas.Provider(resources=[resource])
+    provider.rate_limiter.set_limit("api", ratelimit.RateLimit(rate=20, burst=1))
+    provider.concurrency_limits = concurrency.AdaptiveLimits(
+        initial_limit=2, max_limit=2
+    )
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        reads = asyncio.gather(
+            *(
+                stub.ReadResource(
+                    tfplugin5_1_pb2.ReadResource.Request(
+                        type_name="throttled",
+                        current_state=utils.to_dynamic_value_proto({"id": str(i)}),
+                    )
+                )
+                for i in range(4)
+            )
+        )
+        # The queued reads would have taken their tokens by now
+        await asyncio.sleep(0.2)
+        assert len(resource.started) == 2
+
+        resource.release.set()
+        await reads
+
+    intervals = [b - a for a, b in zip(resource.started, resource.started[1:])]
+    assert min(intervals) >= 0.04
+
+
+class PrefetchResource(schemas.Resource):
+    name = "prefetch"
+
+    value = fields.String(optional=True)
+
+    def __init__(self):
+        super().__init__()
+        self.updated: typing.List[typing.Any] = []
+
+    async def prefetch(self, data):
+        return {"remote": data["value"]}
+
+    async def update(self, data):
+        self.updated.append(data.prefetched)
+
+
+@pytest.mark.asyncio
+async def test_apply_resource_change_uses_prefetched_update():
+    resource = PrefetchResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+    prior_state = {"id": "a", "value": "old"}
+    planned_state = {"id": "a", "value": "new"}
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        async def plan_and_apply():
+            plan = await stub.PlanResourceChange(
+                tfplugin5_1_pb2.PlanResourceChange.Request(
+                    type_name="prefetch",
+                    prior_state=utils.to_dynamic_value_proto(prior_state),
+                    proposed_new_state=utils.to_dynamic_value_proto(planned_state),
+                    config=utils.to_dynamic_value_proto({"value": "new"}),
+                )
+            )
+            await asyncio.sleep(0.01)
+            return await stub.ApplyResourceChange(
+                tfplugin5_1_pb2.ApplyResourceChange.Request(
+                    type_name="prefetch",
+                    prior_state=utils.to_dynamic_value_proto(prior_state),
+                    planned_state=plan.planned_state,
+                    config=utils.to_dynamic_value_proto({"value": "new"}),
+                )
+            )
+
+        applied = await plan_and_apply()
+        # The prefetched result is used once
+        await stub.ApplyResourceChange(
+            tfplugin5_1_pb2.ApplyResourceChange.Request(
+                type_name="prefetch",
+                prior_state=utils.to_dynamic_value_proto(prior_state),
+                planned_state=utils.to_dynamic_value_proto(planned_state),
+                config=utils.to_dynamic_value_proto({"value": "new"}),
+            )
+        )
+
+    assert utils.from_dynamic_value_proto(applied.new_state) == planned_state
+    assert resource.updated == [{"remote": "old"}, None]
+
+
+class SlowPrefetchResource(PrefetchResource):
+    name = "slow_prefetch"
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def prefetch(self, data):
+        await self.release.wait()
+        return await super().prefetch(data)
+
+
+@pytest.mark.asyncio
+async def test_apply_resource_change_waits_for_running_prefetch():
+    resource = SlowPrefetchResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+    prior_state = {"id": "a", "value": "old"}
+    config = {"id": None, "value": "new"}
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        plan = await stub.PlanResourceChange(
+            tfplugin5_1_pb2.PlanResourceChange.Request(
+                type_name="slow_prefetch",
+                prior_state=utils.to_dynamic_value_proto(prior_state),
+                proposed_new_state=utils.to_dynamic_value_proto(
+                    {"id": "a", "value": "new"}
+                ),
+                config=utils.to_dynamic_value_proto(config),
+            )
+        )
+        apply = asyncio.ensure_future(
+            stub.ApplyResourceChange(
+                tfplugin5_1_pb2.ApplyResourceChange.Request(
+                    type_name="slow_prefetch",
+                    prior_state=utils.to_dynamic_value_proto(prior_state),
+                    planned_state=plan.planned_state,
+                    config=utils.to_dynamic_value_proto(config),
+                )
+            )
+        )
+        await asyncio.sleep(0.01)
+        assert not apply.done()
+
+        resource.release.set()
+        await apply
+
+    assert resource.updated == [{"remote": "old"}]
+    assert service.prefetches.stats.hits == 1
+    assert service.scheduler_stats()["plan"].admitted == 1
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_running_operations():
+    resource = BusyResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        apply = asyncio.ensure_future(
+            stub.ApplyResourceChange(
+                tfplugin5_1_pb2.ApplyResourceChange.Request(
+                    type_name="busy",
+                    prior_state=utils.to_dynamic_value_proto(None),
+                    planned_state=utils.to_dynamic_value_proto({"value": "a"}),
+                    config=utils.to_dynamic_value_proto({"value": "a"}),
+                )
+            )
+        )
+        while not resource.calls:
+            await asyncio.sleep(0.001)
+
+        drain = asyncio.ensure_future(service.drain(10))
+        await asyncio.sleep(0)
+        with pytest.raises(grpclib.exceptions.GRPCError) as exc_info:
+            await stub.ReadResource(
+                tfplugin5_1_pb2.ReadResource.Request(
+                    type_name="busy",
+                    current_state=utils.to_dynamic_value_proto({"id": "a"}),
+                )
+            )
+        assert exc_info.value.status == grpclib.const.Status.UNAVAILABLE
+
+        resource.release.set()
+        assert await drain == []
+        response = await apply
+
+    assert utils.from_dynamic_value_proto(response.new_state) == {
+        "id": "a",
+        "value": "a",
+    }
+    assert service.rpcs == {}
+
+
+@pytest.mark.asyncio
+async def test_drain_stops_operations_after_timeout():
+    resource = SlowResource()
+    provider = schemas.Provider(resources=[resource])
+    service = plugin.ProviderService(provider=provider)
+
+    async with ChannelFor([service]) as channel:
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+
+        apply = asyncio.ensure_future(
+            stub.ApplyResourceChange(
+                tfplugin5_1_pb2.ApplyResourceChange.Request(
+                    type_name="slow",
+                    prior_state=utils.to_dynamic_value_proto(None),
+                    planned_state=utils.to_dynamic_value_proto({}),
+                    config=utils.to_dynamic_value_proto({}),
+                )
+            )
+        )
+        await resource.started.wait()
+
+        assert await service.drain(0.01) == ["ApplyResourceChange"]
+        response = await apply
+
+    # Interrupted operations still respond, with the state reached so far
+    assert resource.cleaned_up
+    assert [d.summary for d in response.diagnostics] == ["Operation was stopped"]
+    assert utils.from_dynamic_value_proto(response.new_state) is None
+
+
+def test_create_ssl_context():
+    client_cert = utils.encode_certificate_pem(
+        utils.generate_certificate().certificate
+    ).decode("ascii")
+
+    ctx = plugin.create_ssl_context(utils.generate_certificate(), client_cert)
+    assert ctx.verify_mode == ssl.CERT_REQUIRED
+    assert len(ctx.get_ca_certs()) == 1
+
+
+@pytest.mark.asyncio
+async def test_write_handshake_response():
+    certificate = utils.generate_certificate().certificate
+    file = io.StringIO()
+
+    await plugin.write_handshake_response(
+        file=file,
+        protocol_version=5,
+        network="unix",
+        address="/tmp/plugin123/plugin.sock",
+        certificate=certificate,
+    )
+
+    fields = file.getvalue().rstrip("\n").split("|")
+    assert fields[:5] == ["1", "5", "unix", "/tmp/plugin123/plugin.sock", "grpc"]
+    assert fields[5]
+
+
+@pytest.mark.asyncio
+async def test_write_handshake_response_plaintext():
+    file = io.StringIO()
+
+    await plugin.write_handshake_response(
+        file=file, protocol_version=5, address="127.0.0.1:1234", certificate=None
+    )
+
+    assert file.getvalue() == "1|5|tcp|127.0.0.1:1234|grpc\n"
+
+
+@pytest.mark.asyncio
+async def test_write_reattach_config():
+    file = io.StringIO()
+
+    await plugin.write_reattach_config(
+        file=file,
+        provider_address="registry.terraform.io/acme/example",
+        protocol_version=5,
+        address="127.0.0.1:1234",
+    )
+
+    value = file.getvalue().split("TF_REATTACH_PROVIDERS=")[1].strip().strip("'")
+    assert json.loads(value) == {
+        "registry.terraform.io/acme/example": {
+            "Protocol": "grpc",
+            "ProtocolVersion": 5,
+            "Pid": os.getpid(),
+            "Test": True,
+            "Addr": {"Network": "tcp", "String": "127.0.0.1:1234"},
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_wait_reattached_runs_resets_between_runs():
+    shutdown_event = asyncio.Event()
+    service = plugin.ProviderService(
+        provider=schemas.Provider(), shutdown_event=shutdown_event
+    )
+    schema = service.get_schema()
+    server = grpclib.server.Server([service])
+    await plugin.start_tcp_server(server, min_port=0, max_port=0, ssl_context=None)
+
+    wait = asyncio.ensure_future(
+        plugin.wait_reattached_runs(
+            server=server, shutdown_event=shutdown_event, service=service
+        )
+    )
+    for _ in range(2):
+        stop_event = service.stop_event
+        stop_event.set()
+        shutdown_event.set()
+        while service.stop_event is stop_event:
+            await asyncio.sleep(0.001)
+
+        assert not wait.done()
+        assert not shutdown_event.is_set()
+        assert not service.stop_event.is_set()
+        assert not service.draining
+        assert service.get_schema() is schema
+
+    server.close()
+    await asyncio.wait_for(wait, 1)
+
+
+@pytest.mark.asyncio
+async def test_start_unix_server(tmp_path):
+    service = plugin.ProviderService(provider=schemas.Provider())
+    server = grpclib.server.Server([service])
+
+    path = await plugin.start_unix_server(
+        server, directory=str(tmp_path), ssl_context=None
+    )
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+        channel = grpclib.client.Channel(path=path)
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+        response = await stub.GetSchema(tfplugin5_1_pb2.GetProviderSchema.Request())
+        assert response == service.get_schema()
+        channel.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_bind_tcp_socket_without_range():
+    with plugin.bind_tcp_socket(0, 0) as sock:
+        host, port = sock.getsockname()
+        # For asyncio to set TCP_NODELAY on the accepted connections
+        assert sock.proto == socket.IPPROTO_TCP
+    assert host == "127.0.0.1"
+    assert port != 0
+
+
+def test_bind_tcp_socket_skips_ports_in_use():
+    with plugin.bind_tcp_socket(0, 0) as used:
+        used.listen()
+        port = used.getsockname()[1]
+
+        with plugin.bind_tcp_socket(port, port + 1) as sock:
+            assert sock.getsockname()[1] == port + 1
+
+        with pytest.raises(OSError, match="No free port"):
+            plugin.bind_tcp_socket(port, port)
+
+
+@pytest.mark.asyncio
+async def test_start_tcp_server_skips_ports_listened_on_after_bind(monkeypatch):
+    with plugin.bind_tcp_socket(0, 0) as free:
+        port = free.getsockname()[1]
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as other:
+        # Another plugin launched at the same time binds the port first
+        other.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        other.bind(("127.0.0.1", port))
+
+        class RacingSocket(socket.socket):
+            def bind(self, address):
+                super().bind(address)
+                if address[1] == port:
+                    # and listens on it before this one does
+                    other.listen()
+
+        monkeypatch.setattr(socket, "socket", RacingSocket)
+        server = grpclib.server.Server([])
+        address = await plugin.start_tcp_server(
+            server, min_port=port, max_port=port + 1, ssl_context=None
+        )
+        server.close()
+        await server.wait_closed()
+
+    assert address == f"127.0.0.1:{port + 1}"
+
+
+@pytest.mark.asyncio
+async def test_start_tcp_server():
+    service = plugin.ProviderService(provider=schemas.Provider())
+    server = grpclib.server.Server([service])
+
+    address = await plugin.start_tcp_server(
+        server, min_port=0, max_port=0, ssl_context=None
+    )
+    try:
+        host, port = address.split(":")
+        channel = grpclib.client.Channel(host, int(port))
+        stub = tfplugin5_1_grpc.ProviderStub(channel)
+        await stub.GetSchema(tfplugin5_1_pb2.GetProviderSchema.Request())
+        channel.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_use_uvloop_without_uvloop(monkeypatch):
+    monkeypatch.setitem(sys.modules, "uvloop", None)
+
+    policy = asyncio.get_event_loop_policy()
+    assert not plugin.use_uvloop()
+    assert asyncio.get_event_loop_policy() is policy
+
+
+def test_use_uvloop():
+    uvloop = pytest.importorskip("uvloop")
+
+    policy = asyncio.get_event_loop_policy()
+    try:
+        assert plugin.use_uvloop()
+        assert isinstance(asyncio.get_event_loop_policy(), uvloop.EventLoopPolicy)
+    finally:
+        asyncio.set_event_loop_policy(policy)
+
+
+@pytest.mark.asyncio
+async def test_use_eager_tasks():
+    loop = asyncio.get_running_loop()
+    factory = loop.get_task_factory()
+    try:
+        if not plugin.use_eager_tasks(loop):
+            assert sys.version_info < (3, 12)
+            return
+
+        started = []
+
+        async def start():
+            started.append(True)
+
+        task = loop.create_task(start())
+        # Run up to its completion before the loop iterates
+        assert started and task.done()
+    finally:
+        loop.set_task_factory(factory)
+
+
+def test_run_unsupported_event_loop():
+    with pytest.raises(SystemExit):
+        plugin.run(provider=schemas.Provider(), event_loop="trio")
@@ -0,0 +1,84 @@
+import pytest
+
+from terraform import ratelimit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_reserves_tokens():
+    clock = FakeClock()
+    bucket = ratelimit.TokenBucket(rate=2, burst=2, clock=clock)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+    clock.now = 10
+    assert bucket.reserve() == 0
+
+
+def test_token_bucket_pause():
+    clock = FakeClock()
+    bucket = ratelimit.TokenBucket(rate=10, burst=10, clock=clock)
+
+    bucket.pause(2)
+    assert bucket.reserve() == pytest.approx(2.1)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        pytest.param(None, None, id="missing"),
+        pytest.param("3", 3.0, id="seconds"),
+        pytest.param("-1", 0.0, id="negative"),
+        pytest.param("Thu, 01 Jan 1970 00:01:00 GMT", 30.0, id="date"),
+        pytest.param("soon", None, id="invalid"),
+    ],
+)
+def test_parse_retry_after(value, expected):
+    assert ratelimit.parse_retry_after(value, now=30) == expected
+
+
+def test_backoff_honors_retry_after():
+    for attempt in range(5):
+        delay = ratelimit.backoff(attempt, base_delay=1, max_delay=4)
+        assert 0 <= delay <= min(4, 2 ** attempt)
+
+        delay = ratelimit.backoff(attempt, base_delay=1, max_delay=4, retry_after=10)
+        assert 10 <= delay <= 12
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_retries_rate_limited_calls():
+    limiter = ratelimit.RateLimiter(
+        {"api": ratelimit.RateLimit(rate=1000, burst=10)}, base_delay=0.001
+    )
+    calls = 0
+
+    async def func(value):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise ratelimit.RateLimitedError(retry_after=0.001)
+        return value
+
+    assert await limiter.call("api", func, "ok") == "ok"
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_gives_up():
+    limiter = ratelimit.RateLimiter(retry_attempts=2, base_delay=0.001)
+
+    async def func():
+        raise ratelimit.RateLimitedError
+
+    with pytest.raises(ratelimit.RateLimitedError):
+        await limiter.call(None, func)
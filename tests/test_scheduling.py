@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from terraform import scheduling
+
+
+async def admit_in_order(scheduler, calls):
+    """Queue ``calls`` behind a held slot and return the order they are admitted."""
+    order = []
+    release = asyncio.Event()
+
+    async def call(name, **kwargs):
+        async with scheduler.slot(name, **kwargs):
+            order.append(name)
+            await release.wait()
+
+    async with scheduler.slot("holder"):
+        tasks = [asyncio.ensure_future(call(name, **kwargs)) for name, kwargs in calls]
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_scheduler_admits_by_priority():
+    scheduler = scheduling.Scheduler(1)
+    order = await admit_in_order(
+        scheduler,
+        [
+            ("create", {"priority": scheduling.Priority.MUTATION}),
+            ("plan", {"priority": scheduling.Priority.PLAN}),
+            ("read", {"priority": scheduling.Priority.READ}),
+        ],
+    )
+    assert order == ["read", "plan", "create"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_shares_by_weight():
+    scheduler = scheduling.Scheduler(1)
+    order = await admit_in_order(
+        scheduler,
+        [("heavy", {"weight": 2.0}) for _ in range(6)]
+        + [("light", {"weight": 1.0}) for _ in range(6)],
+    )
+    assert order[:6].count("heavy") == 4
+    assert order[:6].count("light") == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_flow_capacity_does_not_block_other_flows():
+    scheduler = scheduling.Scheduler(10)
+    release = asyncio.Event()
+
+    async def call(flow):
+        async with scheduler.slot(flow, capacity=lambda: 1):
+            await release.wait()
+
+    tasks = [asyncio.ensure_future(call(flow)) for flow in ("a", "a", "b")]
+    await asyncio.sleep(0)
+    assert scheduler.flow_running == {"a": 1, "b": 1}
+    assert scheduler.stats()["read"].queued == 1
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancelled_waiter():
+    now = 0.0
+    scheduler = scheduling.Scheduler(1, clock=lambda: now)
+
+    async with scheduler.slot("a"):
+        cancelled = asyncio.ensure_future(scheduler.acquire("b"))
+        waiting = asyncio.ensure_future(scheduler.acquire("c"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        now = 2.0
+
+    await waiting
+    scheduler.release("c", priority=scheduling.Priority.READ)
+
+    stats = scheduler.stats()["read"]
+    assert stats == scheduling.QueueStats(
+        queued=0, running=0, admitted=2, wait_time=2.0, max_wait_time=2.0
+    )
+    assert stats.mean_wait_time == 1.0
+    assert scheduler.waiters == []
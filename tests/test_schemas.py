@@ -402,3 +402,34 @@ def test_schema(subject: schemas.Schema, want: schemas.Block):
 )
 def test_block_to_proto(subject: schemas.Block, want: tfplugin5_1_pb2.Schema.Block):
     assert subject.to_proto() == want
+
+
+class TimeoutsResource(schemas.Resource):
+    timeouts = schemas.Timeouts(create=60, delete=30)
+
+
+def test_resource_timeouts_block():
+    block = TimeoutsResource().to_block()
+    assert block.block_types["timeouts"] == schemas.NestedBlock(
+        nesting=schemas.NestingMode.SINGLE,
+        block=schemas.Block(
+            attributes={
+                "create": schemas.Attribute(type="string", optional=True),
+                "delete": schemas.Attribute(type="string", optional=True),
+            }
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "operation,values,expected",
+    [
+        pytest.param("create", None, 60, id="default"),
+        pytest.param("create", {"timeouts": None}, 60, id="no block"),
+        pytest.param("create", {"timeouts": {"create": "2m"}}, 120, id="configured"),
+        pytest.param("delete", {"timeouts": {"create": "2m"}}, 30, id="other"),
+        pytest.param("read", None, None, id="undeclared"),
+    ],
+)
+def test_resource_get_timeout(operation, values, expected):
+    assert TimeoutsResource().get_timeout(operation, values) == expected
@@ -0,0 +1,22 @@
+import pytest
+
+from terraform import schemas, serve
+
+provider = schemas.Provider()
+
+
+def test_load_provider():
+    assert serve.load_provider("tests.test_serve:provider") is provider
+
+
+@pytest.mark.parametrize(
+    "target,exception",
+    [
+        ("tests.test_serve", ValueError),
+        ("tests.test_serve:missing", AttributeError),
+        ("tests.test_serve:pytest", TypeError),
+    ],
+)
+def test_load_provider_invalid(target, exception):
+    with pytest.raises(exception):
+        serve.load_provider(target)
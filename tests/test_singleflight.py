@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from terraform import singleflight
+
+
+@pytest.mark.asyncio
+async def test_group_shares_concurrent_calls():
+    group = singleflight.Group()
+    calls = 0
+
+    async def func():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(group.do("key", func) for _ in range(3)))
+    assert results == [1, 1, 1]
+    assert await group.do("key", func) == 2
+    assert group.calls == {}
+
+
+@pytest.mark.asyncio
+async def test_group_cancelled_waiter_does_not_cancel_others():
+    group = singleflight.Group()
+    started = asyncio.Event()
+
+    async def func():
+        started.set()
+        await asyncio.sleep(0.01)
+        return "done"
+
+    first = asyncio.ensure_future(group.do("key", func))
+    second = asyncio.ensure_future(group.do("key", func))
+    await started.wait()
+
+    first.cancel()
+    assert await second == "done"
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_group_cancels_call_without_waiters():
+    group = singleflight.Group()
+    cancelled = asyncio.Event()
+
+    async def func():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.ensure_future(group.do("key", func))
+    await asyncio.sleep(0)
+    waiter.cancel()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_group_starts_new_call_after_cancelling_previous():
+    group = singleflight.Group()
+
+    async def func():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    waiter = asyncio.ensure_future(group.do("key", func))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+
+    assert await group.do("key", func) == "done"
+    assert group.calls == {}
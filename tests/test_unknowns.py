@@ -241,3 +241,19 @@ def test_set_unknowns(
     expected_value: typing.Dict[str, typing.Any],
 ):
     assert unknowns.set_unknowns(value=value, schema=schema) == expected_value
+
+
+def test_remove_unknowns():
+    value = {
+        "foo": unknowns.UNKNOWN,
+        "bar": "bap",
+        "baz": [{"boz": unknowns.UNKNOWN}],
+        "biz": {"a": {"boz": unknowns.UNKNOWN}},
+    }
+
+    assert unknowns.remove_unknowns(value) == {
+        "foo": None,
+        "bar": "bap",
+        "baz": [{"boz": None}],
+        "biz": {"a": {"boz": None}},
+    }
@@ -0,0 +1,68 @@
+import os
+import ssl
+
+import pytest
+
+from terraform import utils
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        pytest.param("0", 0.0, id="zero"),
+        pytest.param("45s", 45.0, id="seconds"),
+        pytest.param("20m", 1200.0, id="minutes"),
+        pytest.param("1h30m", 5400.0, id="compound"),
+        pytest.param("1.5h", 5400.0, id="fraction"),
+        pytest.param("250ms", 0.25, id="milliseconds"),
+    ],
+)
+def test_parse_duration(value, expected):
+    assert utils.parse_duration(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", ["", "5", "m", "5m x", "-5m"])
+def test_parse_duration_invalid(value):
+    with pytest.raises(ValueError):
+        utils.parse_duration(value)
+
+
+def test_digest_separates_parts():
+    assert utils.digest(b"ab", b"c") != utils.digest(b"a", b"bc")
+    assert utils.digest(b"a") == utils.digest(b"a")
+
+
+@pytest.mark.parametrize("curve", sorted(utils.CERTIFICATE_CURVES))
+def test_generate_certificate(curve, tmp_path):
+    certificate_data = utils.generate_certificate(curve)
+
+    # The key and certificate are loaded as they are by run_server
+    keyfile = tmp_path / "key.pem"
+    keyfile.write_bytes(utils.encode_private_key(certificate_data.private_key))
+    certfile = tmp_path / "cert.pem"
+    certfile.write_bytes(utils.encode_certificate_pem(certificate_data.certificate))
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile=str(certfile), keyfile=str(keyfile))
+
+
+def test_generate_certificate_unsupported_curve():
+    with pytest.raises(ValueError, match="Unsupported certificate curve"):
+        utils.generate_certificate("P-192")
+
+
+def test_memory_file():
+    with utils.memory_file(b"secret") as path:
+        with open(path, "rb") as f:
+            assert f.read() == b"secret"
+        if hasattr(os, "memfd_create"):
+            assert path.startswith("/proc/self/fd/")
+
+
+def test_memory_file_falls_back_to_temporary_file(monkeypatch):
+    monkeypatch.delattr(os, "memfd_create", raising=False)
+
+    with utils.memory_file(b"secret") as path:
+        with open(path, "rb") as f:
+            assert f.read() == b"secret"
+    assert not os.path.exists(path)